@@ -0,0 +1,34 @@
+import os
+import tempfile
+import threading
+
+_locks = {}  # absolute path -> lock serializing the writes of this process to the file
+_locks_lock = threading.Lock()
+
+
+def write_atomically(path: str, data: str):
+    """
+    Replaces the content of the file at `path` with `data`.
+
+    The data is written to a uniquely named temporary file in the same directory that then replaces the file, so
+    neither this nor another process ever reads the file half-written. Writes of this process to the same file are
+    serialized. This blocks, so call it from a background thread if the file may be large.
+
+    Raises an `OSError` if the file could not be written, the previous content is kept in that case.
+    """
+    with _locks_lock:
+        lock = _locks.setdefault(os.path.abspath(path), threading.Lock())
+    with lock:
+        directory, name = os.path.split(path)
+        fd, temp_path = tempfile.mkstemp(dir=directory or ".", prefix=name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(data)
+            os.chmod(temp_path, 0o644)  # mkstemp only allows the owner to read the file
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
@@ -1,25 +1,45 @@
+import contextlib
+import glob
+import hashlib
+import json
 import logging
 import os
 import re
+import shutil
+import tempfile
+import threading
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
 
 import youtube_dl
+from src import probe
+from src.atomic_file import write_atomically
 from src.logging_config import stream_handler
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.addHandler(stream_handler)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-CACHE_DIR = os.path.join(BASE_DIR, ".dndj_cache")
-DOWNLOAD_DIR = os.path.join(CACHE_DIR, "downloads")
+DEFAULT_CACHE_DIR = os.environ.get("DNDJ_CACHE_DIR", os.path.join(BASE_DIR, ".dndj_cache"))
 
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
-if not os.path.exists(DOWNLOAD_DIR):
-    os.makedirs(DOWNLOAD_DIR)
+# Set by `configure()`, the directories are created by `configure()` or `prepare()`
+CACHE_DIR = None
+DOWNLOAD_DIR = None
+PCM_DIR = None
+_LOCK_DIR = None
+_TEMP_DIR = None
+_BLOB_DIR = None
+_QUARANTINE_DIR = None
+_INDEX_FILE = None
+_MANIFEST_FILE = None
 
 
 class CacheNotPreparedException(RuntimeError):
@@ -27,29 +47,310 @@ class CacheNotPreparedException(RuntimeError):
         super().__init__("You need to call 'cache.prepare()' before using the cache!")
 
 
-def prepare():
-    global _YOUTUBE_IDS_IN_CACHE
-    _YOUTUBE_IDS_IN_CACHE = tuple(_get_youtube_ids_in_cache())
+class CacheInUseException(RuntimeError):
+    def __init__(self):
+        super().__init__("The cache is being used by another process.")
+
+
+def configure(cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    Sets the location of the cache and creates its directories. Multiple processes can share the same location.
+    """
+    _set_paths(cache_dir)
+    _create_directories()
+
+
+def _set_paths(cache_dir: str):
+    global CACHE_DIR, DOWNLOAD_DIR, PCM_DIR, _LOCK_DIR, _TEMP_DIR, _BLOB_DIR, _QUARANTINE_DIR
+    global _INDEX_FILE, _MANIFEST_FILE
+    CACHE_DIR = os.path.abspath(cache_dir)
+    DOWNLOAD_DIR = os.path.join(CACHE_DIR, "downloads")
+    PCM_DIR = os.path.join(CACHE_DIR, "pcm")
+    _LOCK_DIR = os.path.join(CACHE_DIR, "locks")
+    _TEMP_DIR = os.path.join(CACHE_DIR, "tmp")
+    _BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+    _QUARANTINE_DIR = os.path.join(CACHE_DIR, "quarantine")
+    _INDEX_FILE = os.path.join(CACHE_DIR, "index.jsonl")
+    _MANIFEST_FILE = os.path.join(CACHE_DIR, "manifest.json")
+
+
+def _create_directories():
+    for directory in (CACHE_DIR, DOWNLOAD_DIR, PCM_DIR, _LOCK_DIR, _TEMP_DIR, _BLOB_DIR, _QUARANTINE_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+
+_set_paths(DEFAULT_CACHE_DIR)
+
+
+@contextlib.contextmanager
+def _file_lock(name: str, exclusive: bool = True, blocking: bool = True):
+    """
+    Acquires an advisory lock on the lock file with the given name that is shared by all processes using the cache.
+    Raises a `BlockingIOError` if `blocking` is `False` and the lock is held by another process.
+    On Windows, a blocking acquisition gives up after 10 seconds and raises an `OSError`.
+
+    On Windows, shared locks are not supported and are not acquired at all.
+    """
+    with open(os.path.join(_LOCK_DIR, name + ".lock"), "a+") as lock_file:
+        if fcntl is not None:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            fcntl.flock(lock_file.fileno(), flags if blocking else flags | fcntl.LOCK_NB)
+        elif exclusive:
+            lock_file.seek(0)
+            if blocking:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                except OSError:
+                    raise BlockingIOError("The lock is held by another process.")
+        yield
+
+
+class _CacheIndex:
+    def __init__(self):
+        """
+        The index of the downloaded files that is shared by all processes using the cache.
+
+        Every published download appends a line `{"id": ..., "file": ..., "size": ...}` to the index file and
+        every removed download a line `{"id": ..., "removed": true}`.
+        A process only reads the lines that were appended since it last read the file.
+        """
+        self.youtube_files = {}  # youtube id -> filename in `DOWNLOAD_DIR`
+        self.total_size = 0
+        self._sizes = {}  # youtube id -> file size
+        self._offset = 0
+        self._lock = threading.Lock()
 
+    def refresh(self):
+        """
+        Reads the lines that were appended to the index file since the last refresh.
+        """
+        with self._lock:
+            self._refresh()
 
-def _get_youtube_ids_in_cache() -> List[str]:
-    files = [file for file in os.listdir(DOWNLOAD_DIR) if os.path.isfile(os.path.join(DOWNLOAD_DIR, file))]
-    n_files = len(files)
-    total_file_size_in_bytes = 0
-    for file in files:
-        total_file_size_in_bytes += os.stat(os.path.join(DOWNLOAD_DIR, file)).st_size
+    def _reset(self):
+        self.youtube_files = {}
+        self.total_size = 0
+        self._sizes = {}
+        self._offset = 0
+
+    def _refresh(self):
+        try:
+            with open(_INDEX_FILE, "rb") as index_file:
+                if os.fstat(index_file.fileno()).st_size < self._offset:  # The cache has been cleared
+                    self._reset()
+                index_file.seek(self._offset)
+                data = index_file.read()
+        except FileNotFoundError:
+            self._reset()
+            return
+        complete_data = data[: data.rfind(b"\n") + 1]  # A line that is still being written is read next time
+        self._offset += len(complete_data)
+        for line in complete_data.splitlines():
+            try:
+                record = json.loads(line)
+                youtube_id = record["id"]
+                self.total_size -= self._sizes.pop(youtube_id, 0)
+                self.youtube_files.pop(youtube_id, None)
+                if not record.get("removed", False):
+                    self.youtube_files[youtube_id] = record["file"]
+                    self._sizes[youtube_id] = record["size"]
+                    self.total_size += record["size"]
+            except (ValueError, KeyError):
+                logger.warning("Ignoring invalid line in the cache index: %s", line)
+
+    @staticmethod
+    def append(youtube_id: str, filename: str, size: int):
+        """
+        Appends a record of a published download to the index file.
+        """
+        _CacheIndex._append_record({"id": youtube_id, "file": filename, "size": size})
+
+    @staticmethod
+    def append_removal(youtube_id: str):
+        """
+        Appends a record of a removed download to the index file.
+        """
+        _CacheIndex._append_record({"id": youtube_id, "removed": True})
+
+    @staticmethod
+    def _append_record(record: dict):
+        """
+        Appends a line to the index file. Short appends are atomic, so concurrent writers do not interleave.
+        """
+        record = json.dumps(record) + "\n"
+        fd = os.open(_INDEX_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, record.encode())
+        finally:
+            os.close(fd)
+
+    def rebuild(self):
+        """
+        Creates the index file from the downloaded files. Used for caches created before the index existed.
+        """
+        for file in os.listdir(DOWNLOAD_DIR):
+            path = os.path.join(DOWNLOAD_DIR, file)
+            if os.path.isfile(path):
+                self.append(os.path.splitext(file)[0], file, os.stat(path).st_size)
+
+
+_index = None
+_usage_lock = None
+
+
+def prepare():
+    """
+    Creates the directories of the cache if needed, loads its index and registers this process as user of the cache
+    (see `clear_cache()`).
+    Starts the integrity check of the downloaded files in the background (see `_check_integrity()`), the cache can
+    be used while it runs.
+    """
+    global _index, _usage_lock
+    _create_directories()
+    if not os.path.exists(_INDEX_FILE):
+        with _file_lock("index"):
+            if not os.path.exists(_INDEX_FILE):
+                _CacheIndex().rebuild()
+    _index = _CacheIndex()
+    _index.refresh()
+    if _usage_lock is None:
+        _usage_lock = _file_lock("usage", exclusive=False)
+        _usage_lock.__enter__()
+    n_files = len(_index.youtube_files)
     one_byte_in_gigabyte = 9.3132257461548e-10
-    logger.info(f"Cache contains {n_files} files totaling {total_file_size_in_bytes * one_byte_in_gigabyte:.3f} GB")
+    logger.info("Cache contains %d files totaling %.3f GB", n_files, _index.total_size * one_byte_in_gigabyte)
     logger.info("You can use the bot command '!clear' to clear the cache.")
-    return [os.path.splitext(file)[0] for file in files]
+    threading.Thread(target=_check_integrity, name="cache-integrity-check", daemon=True).start()
+
+
+def _hash_file(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _load_manifest() -> dict:
+    try:
+        with open(_MANIFEST_FILE, "r") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        logger.warning("Could not read the cache manifest, all files will be checked again.")
+        return {}
 
 
-_YOUTUBE_IDS_IN_CACHE = CacheNotPreparedException()
+def _check_integrity():
+    """
+    Checks every downloaded file that changed since the last check. Stores its SHA-256 hash and size in the
+    manifest, hard-links files with the same content to a single blob and quarantines files that cannot be probed
+    (they are downloaded again once they are needed, see `get_path_of_youtube_id()`). Blobs that are no longer
+    linked to any download are deleted. Whether a file changed is determined by its inode, size and modification
+    time only, so the check is cheap if nothing changed.
+    """
+    try:
+        with _file_lock("manifest"):
+            manifest = _load_manifest()
+            filenames = set(_index.youtube_files.values())
+            is_changed = False
+            for filename in list(manifest):
+                if filename not in filenames:
+                    del manifest[filename]
+                    is_changed = True
+            for youtube_id, filename in list(_index.youtube_files.items()):
+                entry = _check_file_integrity(youtube_id, filename, manifest.get(filename))
+                if entry is not manifest.get(filename):
+                    is_changed = True
+                    if entry is None:
+                        manifest.pop(filename, None)
+                    else:
+                        manifest[filename] = entry
+            if is_changed:
+                write_atomically(_MANIFEST_FILE, json.dumps(manifest))
+            _delete_unused_blobs()
+        _index.refresh()
+    except Exception:
+        logger.exception("The integrity check of the cache failed.")
+
+
+def _check_file_integrity(youtube_id: str, filename: str, entry: Optional[dict]) -> Optional[dict]:
+    """
+    Checks a single downloaded file. Returns the given manifest entry if the file did not change, a new entry if it
+    did or `None` if the file was quarantined, could not be checked (yet) or does not exist.
+    """
+    path = os.path.join(DOWNLOAD_DIR, filename)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+    if entry is not None and entry["key"] == key:
+        return entry
+    digest = _hash_file(path)
+    try:
+        probe.probe_duration(path)
+    except probe.ProbeError:
+        logger.warning("Quarantined %s since it could not be probed, it will be downloaded again.", filename)
+        os.replace(path, os.path.join(_QUARANTINE_DIR, filename))
+        _CacheIndex.append_removal(youtube_id)
+        return None
+    except TimeoutError:
+        logger.warning("Probing %s timed out, it will be checked again next time.", filename)
+        return None
+    except OSError:
+        pass  # ffprobe is not available
+    blob_path = os.path.join(_BLOB_DIR, digest)
+    try:
+        if not os.path.exists(blob_path):
+            os.link(path, blob_path)
+        elif not os.path.samefile(blob_path, path):
+            temp_path = path + ".tmp"
+            os.link(blob_path, temp_path)
+            os.replace(temp_path, path)
+            logger.info("Deduplicated %s, its content is already in the cache.", filename)
+            stat = os.stat(path)
+            key = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        pass  # The file system does not support hard links
+    return {"key": key, "sha256": digest, "size": stat.st_size}
+
+
+def _delete_unused_blobs():
+    """
+    Deletes the blobs that are not hard-linked to any download anymore.
+    """
+    for blob in os.listdir(_BLOB_DIR):
+        blob_path = os.path.join(_BLOB_DIR, blob)
+        try:
+            if os.stat(blob_path).st_nlink == 1:
+                os.remove(blob_path)
+        except OSError:
+            pass
+
+
+def _get_quarantined_files(youtube_id: str) -> List[str]:
+    """
+    Returns the paths of the quarantined downloads of the YouTube video.
+    """
+    return glob.glob(os.path.join(_QUARANTINE_DIR, glob.escape(youtube_id) + ".*"))
+
+
+def release():
+    """
+    Unregisters this process as user of the cache.
+    """
+    global _usage_lock
+    if _usage_lock is not None:
+        _usage_lock.__exit__(None, None, None)
+        _usage_lock = None
 
 
 _ytdl_options = {
     "format": "bestaudio/best",
-    "outtmpl": os.path.join(DOWNLOAD_DIR, "%(id)s.%(ext)s"),
     "restrictfilenames": True,
     "noplaylist": True,
     "nocheckcertificate": True,
@@ -61,20 +362,51 @@ _ytdl_options = {
     "source_address": "0.0.0.0",  # bind to ipv4 since ipv6 addresses cause issues sometimes
 }
 
-_ytdl = youtube_dl.YoutubeDL(_ytdl_options)
-
 
 def download_youtube_audio_if_not_in_cache(url: str) -> bool:
     """
     Downloads a youtube video if it has not been already downloaded.
+
+    The video is downloaded to a temporary file that is renamed once the download is complete, so other processes
+    never see a partial file. Only one process downloads a given video at a time, the others wait for it.
+
     :param url: url of the youtube video
     :return: `True` if the video had to be downloaded, `False` otherwise
     """
+    if _index is None:
+        raise CacheNotPreparedException()
     youtube_id = get_youtube_id(url)
-    if youtube_id not in _YOUTUBE_IDS_IN_CACHE:
-        _ytdl.extract_info(url, download=True)
-        return True
-    return False
+    _index.refresh()
+    if youtube_id in _index.youtube_files:
+        return False
+    with _file_lock("youtube-" + youtube_id):
+        _index.refresh()  # Another process may have downloaded it while we were waiting for the lock
+        if youtube_id in _index.youtube_files:
+            return False
+        temp_dir = tempfile.mkdtemp(dir=_TEMP_DIR)
+        try:
+            ytdl = youtube_dl.YoutubeDL(dict(_ytdl_options, outtmpl=os.path.join(temp_dir, "%(id)s.%(ext)s")))
+            info_dict = ytdl.extract_info(url, download=True)
+            temp_path = ytdl.prepare_filename(info_dict)
+            filename = os.path.basename(temp_path)
+            size = os.stat(temp_path).st_size
+            os.replace(temp_path, os.path.join(DOWNLOAD_DIR, filename))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        _index.append(youtube_id, filename, size)
+        _index.refresh()
+    return True
+
+
+def get_playlist_video_urls(url: str) -> List[str]:
+    """
+    Returns the URLs of the videos in the YouTube playlist (or channel) in their order. Only the playlist itself is
+    fetched, not the videos. This blocks, so call it from a background thread.
+    """
+    ytdl = youtube_dl.YoutubeDL(dict(_ytdl_options, noplaylist=False, extract_flat="in_playlist"))
+    info_dict = ytdl.extract_info(url, download=False)
+    entries = info_dict.get("entries") or []
+    return [f"https://www.youtube.com/watch?v={entry['id']}" for entry in entries if entry and entry.get("id")]
 
 
 _YOUTUBE_ID_REGEX = re.compile(
@@ -90,18 +422,56 @@ def get_youtube_id(url: str) -> str:
     return match.group(1)
 
 
-@lru_cache(maxsize=50)
-def get_filename_of_youtube_url(url: str) -> str:
-    info_dict = _ytdl.extract_info(url, download=False)
-    return _ytdl.prepare_filename(info_dict)
+def get_path_of_youtube_id(youtube_id: str) -> Optional[str]:
+    """
+    Returns the path of the downloaded audio of the YouTube video or `None` if it is not in the cache.
+    If the integrity check quarantined the download, it is downloaded again first (this blocks).
+    """
+    if _index is None:
+        raise CacheNotPreparedException()
+    if youtube_id not in _index.youtube_files:
+        _index.refresh()
+    filename = _index.youtube_files.get(youtube_id)
+    if filename is None and len(_get_quarantined_files(youtube_id)) > 0:
+        filename = _download_quarantined(youtube_id)
+    return os.path.join(DOWNLOAD_DIR, filename) if filename is not None else None
+
+
+def _download_quarantined(youtube_id: str) -> Optional[str]:
+    """
+    Downloads the YouTube video whose download was quarantined by the integrity check again and deletes the
+    quarantined file. Returns the name of the new download or `None` if it failed.
+    """
+    logger.info("Downloading the quarantined video %s again...", youtube_id)
+    try:
+        download_youtube_audio_if_not_in_cache(f"https://www.youtube.com/watch?v={youtube_id}")
+    except Exception:
+        logger.exception("Could not download the quarantined video %s again.", youtube_id)
+        return None
+    for path in _get_quarantined_files(youtube_id):
+        os.remove(path)
+    return _index.youtube_files.get(youtube_id)
 
 
 def clear_cache() -> bool:
+    """
+    Deletes all downloaded and decoded files.
+
+    Raises a `CacheInUseException` if another process is using the cache, since it may be playing the files.
+    """
     try:
-        for file in os.listdir(DOWNLOAD_DIR):
-            filepath = os.path.join(DOWNLOAD_DIR, file)
-            if os.path.isfile(filepath):
-                os.unlink(filepath)
+        with _file_lock("usage", blocking=False):
+            with _file_lock("index"):
+                for directory in (DOWNLOAD_DIR, PCM_DIR, _BLOB_DIR, _QUARANTINE_DIR):
+                    for file in os.listdir(directory):
+                        filepath = os.path.join(directory, file)
+                        if os.path.isfile(filepath):
+                            os.unlink(filepath)
+                for file in (_INDEX_FILE, _MANIFEST_FILE):
+                    if os.path.exists(file):
+                        os.unlink(file)
         return True
+    except BlockingIOError:
+        raise CacheInUseException()
     except OSError:
         return False
@@ -1,5 +1,105 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
 
-stream_handler = logging.StreamHandler()
-_formatter = logging.Formatter("%(asctime)s | %(levelname)-7s | %(name)-25s | %(message)s", datefmt="%H:%M:%S")
-stream_handler.setFormatter(_formatter)
+# Id of the client (websocket connection) the current task handles, added to every record logged within it
+client_id = contextvars.ContextVar("client_id", default=None)
+_session_id = None
+
+_TEXT_FORMATTER = logging.Formatter("%(asctime)s | %(levelname)-7s | %(name)-25s | %(message)s", datefmt="%H:%M:%S")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats every record as a single JSON object including the session and client it was logged in.
+    """
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "session", None) is not None:
+            data["session"] = record.session
+        if getattr(record, "client", None) is not None:
+            data["client"] = record.client
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+class _ContextFilter(logging.Filter):
+    """
+    Adds the id of the session and of the client to the record. Runs in the thread that logs the record.
+    """
+
+    def filter(self, record):
+        record.session = _session_id
+        record.client = client_id.get()
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records into the queue without formatting them, the message is formatted by the listener thread.
+    Arguments of a record must therefore not be changed after logging it.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+_queue = queue.SimpleQueue()
+_output_handler = logging.StreamHandler()
+_output_handler.setFormatter(_TEXT_FORMATTER)
+_listener = logging.handlers.QueueListener(_queue, _output_handler)
+_listener.start()
+atexit.register(_listener.stop)
+
+# Every module adds this handler to its logger. It only puts the records into a queue, they are formatted and
+# written to stderr by a background thread, so logging never blocks the event loop or the audio player thread.
+stream_handler = _LazyQueueHandler(_queue)
+stream_handler.addFilter(_ContextFilter())
+
+
+def configure(log_format: str = "text", level: str = None):
+    """
+    Configures the output of all loggers.
+
+    :param log_format: either "text" (human-readable) or "json" (one JSON object per line)
+    :param level: the level of all loggers of the bot (e.g., "DEBUG") or `None` to keep it
+    """
+    _output_handler.setFormatter(JsonFormatter() if log_format == "json" else _TEXT_FORMATTER)
+    if level is not None:
+        set_level(level)
+
+
+def set_session_id(session_id: str = None):
+    """
+    Sets the id of the session that is added to every record (`None` if no session is running).
+    """
+    global _session_id
+    _session_id = session_id
+
+
+def set_level(level: str, name: str = "src") -> int:
+    """
+    Sets the level of the logger with the given name and of all its children. Raises a `ValueError` if the level
+    is unknown.
+
+    :param level: name of the level (e.g., "DEBUG")
+    :param name: name of the logger, the loggers of the bot are all children of "src"
+    :return: the numeric level
+    """
+    numeric_level = logging.getLevelName(level.upper())
+    if not isinstance(numeric_level, int):
+        raise ValueError(f"Unknown log level '{level}'.")
+    for logger_name in list(logging.Logger.manager.loggerDict):
+        if logger_name == name or logger_name.startswith(name + "."):
+            logging.getLogger(logger_name).setLevel(numeric_level)
+    return numeric_level
@@ -0,0 +1,135 @@
+import logging
+import multiprocessing
+from typing import Dict
+
+import discord
+from src.logging_config import stream_handler
+from src.music.audio_worker import FRAME_SIZE, FrameRing, run_worker, shared_memory
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+_SILENCE = b"\0" * FRAME_SIZE
+
+
+class RingBufferAudio(discord.AudioSource):
+    # The worker process applies the volume (see `PositionTrackingAudio`)
+    applies_volume = True
+
+    def __init__(self, engine: "AudioEngine", generation: int):
+        """
+        Initializes a `RingBufferAudio` instance.
+
+        Plays the frames the worker process of the `AudioEngine` writes to the ring for the given generation. The
+        frames are already decoded and their volume is applied, so reading a frame only copies it out of the shared
+        memory. Plays silence while the worker falls behind (e.g., while FFmpeg starts).
+
+        :param engine: the `AudioEngine` playing the track
+        :param generation: the generation of the track
+        """
+        self.engine = engine
+        self.generation = generation
+        self.is_filler = False  # Whether the last frame read is silence played while the worker falls behind
+
+    def read(self):
+        ring = self.engine.ring
+        if ring is None:
+            return b""  # The engine has been closed
+        frame = ring.read(self.generation)
+        self.is_filler = frame is None
+        return frame if frame is not None else _SILENCE
+
+    def cleanup(self):
+        self.engine.stop(self.generation)
+
+
+class AudioEngine:
+    def __init__(self, config: Dict = None):
+        """
+        Initializes an `AudioEngine` instance.
+
+        Decodes the tracks and applies their volume in a worker process, so the audio does not compete with the web
+        server (or downloads) for the GIL of the bot process. The worker writes the ready frames to a ring in shared
+        memory that is read by a `RingBufferAudio`. Play, stop and volume changes are sent to the worker over a
+        pipe. Volume changes apply to the frames that are not in the ring yet, so the ring is kept short.
+
+        Requires Python 3.8 or later (see `is_available()`).
+
+        The `config` parameter is expected to be a dictionary with the following keys:
+        - "ring_frames": number of 20ms frames the ring holds (Optional, default=10)
+
+        :param config: `dict`
+        """
+        config = config if config is not None else {}
+        self.ring_frames = int(config["ring_frames"]) if "ring_frames" in config else 10
+        self._generation = 0
+        self._shared_memory = shared_memory.SharedMemory(create=True, size=FrameRing.get_size(self.ring_frames))
+        self.ring = FrameRing(self._shared_memory.buf, self.ring_frames)
+        context = multiprocessing.get_context("spawn")  # Do not fork the threads of the bot process
+        self._connection, worker_connection = context.Pipe()
+        self._process = context.Process(
+            target=run_worker,
+            args=(worker_connection, self._shared_memory.name, self.ring_frames),
+            name="audio-engine",
+            daemon=True,
+        )
+        self._process.start()
+        worker_connection.close()
+        logger.info("Started the audio engine (pid=%d)", self._process.pid)
+
+    @staticmethod
+    def is_available() -> bool:
+        """
+        Returns `True` if shared memory is supported (Python 3.8 or later).
+        """
+        return shared_memory is not None
+
+    def play(
+        self, path: str, ffmpeg_before_options: str, volume: float, pcm_path: str = None, position: int = 0
+    ) -> RingBufferAudio:
+        """
+        Starts to decode a track and returns the source playing it. A track that is still being decoded is replaced.
+
+        :param path: path of the file
+        :param ffmpeg_before_options: FFmpeg input options (including the position to start at)
+        :param volume: the volume as float between 0 and 1 (or higher)
+        :param pcm_path: path of the decoded PCM file, it is read instead of running FFmpeg (Optional)
+        :param position: millisecond at which to start reading the `pcm_path`
+        """
+        self._generation += 1
+        if pcm_path is not None:
+            decoder = ("pcm", pcm_path, (position // 20) * FRAME_SIZE)
+        else:
+            decoder = ("ffmpeg", path, ffmpeg_before_options)
+        self._connection.send(("play", self._generation, decoder, volume))
+        return RingBufferAudio(self, self._generation)
+
+    def set_volume(self, volume: float):
+        """
+        Sets the volume of the track that is being decoded.
+        """
+        self._connection.send(("volume", volume))
+
+    def stop(self, generation: int):
+        """
+        Stops decoding the track of the given generation, unless it has already been replaced by another one.
+        """
+        if generation == self._generation and self.ring is not None:
+            self._connection.send(("stop",))
+
+    def close(self):
+        """
+        Stops the worker process and frees the shared memory.
+        """
+        try:
+            self._connection.send(("close",))
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout=2)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+        self.ring = None
+        self._shared_memory.close()
+        self._shared_memory.unlink()
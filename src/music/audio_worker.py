@@ -0,0 +1,156 @@
+import logging
+import struct
+import subprocess
+import time
+from typing import Optional
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+# This module is imported by the worker process of the `AudioEngine`, so it only imports the standard library (and
+# nothing that does work on import, e.g., the cache or the logging configuration)
+
+# Not configured in the worker process, warnings and errors are written to stderr
+logger = logging.getLogger(__name__)
+
+# 20ms of 16-bit 48kHz stereo PCM, the same as `pcm_cache.FRAME_SIZE` (which cannot be imported here)
+FRAME_SIZE = 3840
+
+# The ring starts with the write index and the read index (both count frames since the ring was created)
+_HEADER = struct.Struct("<QQ")
+# Every slot starts with the generation of the frame and its length, a length of 0 marks the end of a track
+_SLOT_HEADER = struct.Struct("<QI")
+_SLOT_SIZE = _SLOT_HEADER.size + FRAME_SIZE
+
+
+class FrameRing:
+    def __init__(self, buffer: memoryview, slot_count: int):
+        """
+        Initializes a `FrameRing` instance.
+
+        A single-producer single-consumer ring of PCM frames in shared memory. The worker process only writes the
+        write index and the bot process only writes the read index, so no lock is needed. Every frame is tagged with
+        the generation of the track it belongs to, so frames of a track that was replaced are skipped.
+
+        :param buffer: the shared memory
+        :param slot_count: number of frames the ring holds
+        """
+        self.buffer = buffer
+        self.slot_count = slot_count
+
+    @staticmethod
+    def get_size(slot_count: int) -> int:
+        return _HEADER.size + slot_count * _SLOT_SIZE
+
+    def write(self, generation: int, frame: bytes) -> bool:
+        """
+        Appends the frame. Returns `False` if the ring is full.
+        """
+        write_index, read_index = _HEADER.unpack_from(self.buffer, 0)
+        if write_index - read_index >= self.slot_count:
+            return False
+        offset = _HEADER.size + (write_index % self.slot_count) * _SLOT_SIZE
+        _SLOT_HEADER.pack_into(self.buffer, offset, generation, len(frame))
+        self.buffer[offset + _SLOT_HEADER.size : offset + _SLOT_HEADER.size + len(frame)] = frame
+        struct.pack_into("<Q", self.buffer, 0, write_index + 1)
+        return True
+
+    def read(self, generation: int) -> Optional[bytes]:
+        """
+        Returns the next frame of the given generation (an empty frame at the end of the track) or `None` if there
+        is none yet. Frames of older generations are skipped.
+        """
+        while True:
+            write_index, read_index = _HEADER.unpack_from(self.buffer, 0)
+            if read_index >= write_index:
+                return None
+            offset = _HEADER.size + (read_index % self.slot_count) * _SLOT_SIZE
+            frame_generation, length = _SLOT_HEADER.unpack_from(self.buffer, offset)
+            if frame_generation > generation:
+                return None  # Left for the source playing the newer track
+            frame = None
+            if frame_generation == generation:
+                frame = bytes(self.buffer[offset + _SLOT_HEADER.size : offset + _SLOT_HEADER.size + length])
+            struct.pack_into("<Q", self.buffer, 8, read_index + 1)
+            if frame is not None:
+                return frame
+
+
+def _open_decoder(decoder):
+    """
+    Returns a file object that reads PCM frames from the given decoder spec and the FFmpeg process (or `None`).
+    """
+    kind, path, option = decoder
+    if kind == "pcm":
+        file = open(path, "rb")
+        file.seek(option)
+        return file, None
+    command = ["ffmpeg", *option.split(), "-i", path, "-f", "s16le", "-ar", "48000", "-ac", "2"]
+    command += ["-loglevel", "warning", "pipe:1"]
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+    return process.stdout, process
+
+
+def _close_decoder(file, process):
+    file.close()
+    if process is not None:
+        process.kill()
+        process.wait()
+
+
+def run_worker(connection, shared_memory_name: str, slot_count: int):
+    """
+    Main loop of the worker process: decodes the current track, applies its volume and writes the frames to the
+    ring. Waits while the ring is full and exits once the pipe is closed.
+    """
+    memory = shared_memory.SharedMemory(name=shared_memory_name)
+    ring = FrameRing(memory.buf, slot_count)
+    decoder = None  # (file, process)
+    generation = 0
+    volume = 1.0
+    frame = None  # The frame that did not fit into the ring yet
+    try:
+        while True:
+            if decoder is None or connection.poll():
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    break
+                if message[0] == "close":
+                    break
+                if message[0] == "volume":
+                    volume = message[1]
+                    continue
+                if decoder is not None:
+                    _close_decoder(*decoder)
+                    decoder = None
+                frame = None
+                if message[0] == "play":
+                    _, generation, decoder_spec, volume = message
+                    try:
+                        decoder = _open_decoder(decoder_spec)
+                    except OSError:
+                        logger.exception("Could not decode %s", decoder_spec[1])
+                        while not ring.write(generation, b""):
+                            time.sleep(0.005)
+                continue
+            if frame is None:
+                data = decoder[0].read(FRAME_SIZE)
+                if len(data) != FRAME_SIZE:
+                    frame = b""  # End of the track, a trailing partial frame is dropped
+                else:
+                    frame = audioop.mul(data, 2, min(volume, 2.0)) if volume != 1.0 else data
+            if not ring.write(generation, frame):
+                time.sleep(0.005)
+                continue
+            if len(frame) == 0:
+                _close_decoder(*decoder)
+                decoder = None
+            frame = None
+    finally:
+        if decoder is not None:
+            _close_decoder(*decoder)
+        ring.buffer = None
+        memory.close()
@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+from src.atomic_file import write_atomically
+from src.logging_config import stream_handler
+from src.music import utils
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+
+class DurationCache:
+    def __init__(self, path: str):
+        """
+        Initializes a `DurationCache` instance.
+
+        Stores the duration of every probed file together with its size and modification time, so every file is
+        only probed once (and again if it changes). The durations are loaded from and saved to the JSON file at
+        `path`, so they carry over between sessions.
+
+        :param path: path of the JSON file
+        """
+        self.path = path
+        self._durations = {}  # file path -> [size, mtime_ns, duration in seconds]
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as file:
+                self._durations = dict(json.load(file))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError):
+            logger.warning("Could not read the durations at %s, all files will be probed again.", path)
+
+    def get(self, path: str) -> Optional[float]:
+        """
+        Returns the duration of the file in seconds or `None` if it cannot be probed. The file is probed if its
+        duration is unknown or it changed. This blocks, so call it from a background thread.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            known = self._durations.get(path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        duration = utils.probe_duration(path)
+        if duration is None:
+            return None
+        with self._lock:
+            self._durations[path] = [stat.st_size, stat.st_mtime_ns, duration]
+            data = json.dumps(self._durations)
+        self._write(data)
+        return duration
+
+    def get_known(self, path: str) -> Optional[float]:
+        """
+        Returns the stored duration of the file in seconds without probing or checking it, `None` if it is unknown.
+        """
+        known = self._durations.get(path)
+        return known[2] if known is not None else None
+
+    def _write(self, data: str):
+        """
+        Writes the durations to their file (see `write_atomically()`).
+        """
+        try:
+            write_atomically(self.path, data)
+        except OSError:
+            logger.warning("Could not save the durations to %s", self.path)
@@ -7,3 +7,4 @@ class MusicActions(Enum):
     FINISH = 3
     MASTER_VOLUME = 4
     TRACK_LIST_VOLUME = 5
+    POSITION = 6
@@ -6,6 +6,7 @@ from src.cache import download_youtube_audio_if_not_in_cache
 from src.check_version import is_latest_youtube_dl_version
 from src.logging_config import stream_handler
 from src.music.music_group import MusicGroup
+from src.music.music_scene import MusicScene
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -13,26 +14,36 @@ logger.addHandler(stream_handler)
 
 
 class MusicChecker:
-    def do_all_checks(self, groups: Iterable[MusicGroup], default_dir):
+    def do_all_checks(
+        self,
+        groups: Iterable[MusicGroup],
+        default_dir,
+        scenes: Iterable[MusicScene] = (),
+        check_ytdl_version: bool = True,
+    ):
         """
         Perform all the available checks.
 
         :param groups: `MusicGroup` instances to check
         :param default_dir: default directory where the tracks are located
+        :param scenes: `MusicScene` instances to check
+        :param check_ytdl_version: whether to check online if a new version of 'youtube-dl' is available
         """
-        self.download_youtube_videos(groups)
+        self.download_youtube_videos(groups, check_ytdl_version)
         self.check_track_list_names(groups)
         self.check_tracks_do_exist(groups, default_dir)
+        self.check_scenes(scenes, groups)
 
-    def download_youtube_videos(self, groups: Iterable[MusicGroup]):
+    def download_youtube_videos(self, groups: Iterable[MusicGroup], check_ytdl_version: bool = True):
         """
-        Downloads all youtube videos.
+        Downloads all youtube videos. Cached files that fail the integrity check of the cache (which runs in the
+        background) are downloaded again by it.
 
         :param groups: `MusicGroup` instances to check
+        :param check_ytdl_version: whether to check online if a new version of 'youtube-dl' is available
         """
         logger.info("Downloading youtube videos...")
-        is_latest_ytdl_version = is_latest_youtube_dl_version()
-        if not is_latest_ytdl_version:
+        if check_ytdl_version and not is_latest_youtube_dl_version():
             logger.warning("A new version of the 'youtube-dl' package is available.")
             logger.warning("YouTube support may not work if the package is not updated.")
             logger.warning("Type 'pip install --upgrade youtube-dl' to update it.")
@@ -40,7 +51,7 @@ class MusicChecker:
             if track.is_youtube_link:
                 new_download = download_youtube_audio_if_not_in_cache(track.file)
                 if new_download:
-                    logger.info(f"Downloaded youtube video with url={track.file}")
+                    logger.info("Downloaded youtube video with url=%s", track.file)
         logger.info("Success! All youtube videos have been downloaded.")
 
     def check_track_list_names(self, groups: Iterable[MusicGroup]):
@@ -58,7 +69,7 @@ class MusicChecker:
                 if track_list.name not in names:
                     names.add(track_list.name)
                 else:
-                    logger.error(f"Found multiple track lists with the same name '{track_list.name}'.")
+                    logger.error("Found multiple track lists with the same name '%s'.", track_list.name)
                     raise RuntimeError(
                         f"The names of the track lists must be unique. Found duplicate with name "
                         f"'{track_list.name}'."
@@ -68,7 +79,7 @@ class MusicChecker:
         if not next_names.issubset(names):
             for next_name in next_names:
                 if next_name not in names:
-                    logger.error(f"'{next_name}' points to a non-existing track list.")
+                    logger.error("'%s' points to a non-existing track list.", next_name)
                     raise RuntimeError(f"'{next_name}' points to a non-existing track list.")
         logger.info("Success! Names are unique and `next` parameters point to existing track lists.")
 
@@ -81,6 +92,37 @@ class MusicChecker:
             try:
                 utils.get_track_path(group, track_list, track, default_dir=default_dir)
             except Exception as ex:
-                logger.error(f"Track '{track.file}' does not point to a valid path.")
+                logger.error("Track '%s' does not point to a valid path.", track.file)
                 raise ex
         logger.info("Success! All tracks point to valid paths.")
+
+    def check_scenes(self, scenes: Iterable[MusicScene], groups: Iterable[MusicGroup]):
+        """
+        Iterates through every scene, checks that the names are unique, that the track lists they refer to exist
+        and that their volumes are between 0 and 100.
+
+        Raises a `RuntimeError` if any of the above is not the case.
+        """
+        logger.info("Checking scenes...")
+        track_list_names = set(track_list.name for group in groups for track_list in group.track_lists)
+        scene_names = set()
+        for scene in scenes:
+            if scene.name in scene_names:
+                logger.error("Found multiple scenes with the same name '%s'.", scene.name)
+                raise RuntimeError(f"The names of the scenes must be unique. Found duplicate with name '{scene.name}'.")
+            scene_names.add(scene.name)
+            referenced_names = [name for name, _ in scene.track_list_volumes]
+            if scene.play is not None:
+                referenced_names.append(scene.play)
+            for name in referenced_names:
+                if name not in track_list_names:
+                    logger.error("Scene '%s' points to a non-existing track list '%s'.", scene.name, name)
+                    raise RuntimeError(f"Scene '{scene.name}' points to a non-existing track list '{name}'.")
+            volumes = [volume for _, volume in scene.track_list_volumes]
+            if scene.volume is not None:
+                volumes.append(scene.volume)
+            for volume in volumes:
+                if not 0 <= volume <= 100:
+                    logger.error("Scene '%s' has an invalid volume %s.", scene.name, volume)
+                    raise RuntimeError(f"The volumes of scene '{scene.name}' must be between 0 and 100.")
+        logger.info("Success! Scenes point to existing track lists.")
@@ -1,9 +1,13 @@
+import sys
 from typing import Dict
 
 from src.music.track_list import TrackList
 
 
 class MusicGroup:
+
+    __slots__ = ("name", "directory", "track_lists")
+
     def __init__(self, config: Dict):
         """
         Initializes a `MusicGroup` instance.
@@ -20,7 +24,7 @@ class MusicGroup:
         :param config: `dict`
         """
         self.name = config["name"]
-        self.directory = config["directory"] if "directory" in config else None
+        self.directory = sys.intern(config["directory"]) if "directory" in config else None
         track_lists = [TrackList(track_list_config) for track_list_config in config["track_lists"]]
         if "sort" not in config or ("sort" in config and config["sort"]):
             track_lists = sorted(track_lists, key=lambda x: x.name)
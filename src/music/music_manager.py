@@ -1,16 +1,30 @@
 import asyncio
 import logging
+import os
+import sys
 from collections import namedtuple
-from typing import Tuple
+from functools import partial
+from typing import Dict, Optional, Tuple
 
 import discord
+from src import cache
 from src.logging_config import stream_handler
 from src.music import utils
+from src.music.audio_engine import AudioEngine
+from src.music.duration_cache import DurationCache
 from src.music.music_actions import MusicActions
 from src.music.music_callbacks import MusicCallbackHandler
 from src.music.music_checker import MusicChecker
 from src.music.music_group import MusicGroup
+from src.music.music_scene import MusicScene, ScenePlan
+from src.music.music_search import MusicSearchIndex
 from src.music.music_state import MusicState
+from src.music.pcm_cache import PCMCache
+from src.music.play_history import PlayHistory
+from src.music.playback_position import PlaybackPosition, PositionTrackingAudio, ResumePosition, ResumePositions
+from src.music.prefetcher import Prefetcher
+from src.music.track_expander import TrackExpander
+from src.music.track_queue import TrackQueue
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -20,7 +34,7 @@ _CurrentlyPlaying = namedtuple("_CurrentlyPlaying", ["group_index", "track_list_
 
 
 class MusicManager:
-    def __init__(self, config, callback_fn):
+    def __init__(self, config, callback_fn, is_warm_start: bool = False):
         """
         Initializes a `MusicManager` instance.
 
@@ -29,25 +43,71 @@ class MusicManager:
         - "directory": the default directory to use if no directory is further specified (Optional)
         - "sort": whether to sort the groups alphabetically (Optional, default=True)
         - "groups": a list of configs for `MusicGroup` instances. See `MusicGroup` class for more information
+        - "scenes": a list of configs for `MusicScene` instances. See `MusicScene` class for more information
+          (Optional)
+        - "pcm_cache": config for the `PCMCache` used for short looping tracks. See `PCMCache` class for more
+          information (Optional)
+        - "prefetch": config for the `Prefetcher` that prepares the track lists likely to be played next.
+          See `Prefetcher` class for more information (Optional)
+        - "playlists": config for the `TrackExpander` that expands playlists and globs into tracks.
+          See `TrackExpander` class for more information (Optional)
+        - "audio_engine": config for the `AudioEngine` that decodes the tracks in a separate process. The engine is
+          only used if this config contains `enabled: true`. See `AudioEngine` class for more information (Optional)
 
         The `callback_fn` is an async coroutine that should accept the following arguments:
         - "action": value of type `MusicActions`
-        - "request": the request that caused the action
+        - "request": the request (or the Discord command context) that caused the action, `None` if there is none
         - "state": an instance of `MusicState` (fields are `None` if nothing is being played)
 
         :param config: `dict`
         :param callback_fn: function to call when the state of the music changes
+        :param is_warm_start: whether a previous session is restored. Skips the checks that need the network (except
+            for downloading missing YouTube videos) and uses the stored playlists regardless of their age
         """
         self.volume = int(config["volume"])
-        self.directory = config["directory"] if "directory" in config else None
-        groups = [MusicGroup(group_config) for group_config in config["groups"]]
+        self.directory = sys.intern(config["directory"]) if "directory" in config else None
+        track_expander = TrackExpander(
+            self.directory, config["playlists"] if "playlists" in config else None, ignore_ttl=is_warm_start
+        )
+        groups = [MusicGroup(group_config) for group_config in track_expander.expand(config["groups"])]
         if "sort" not in config or ("sort" in config and config["sort"]):
             groups = sorted(groups, key=lambda x: x.name)
         self.groups = tuple(groups)
+        scenes = config["scenes"] if "scenes" in config else []
+        self.scenes = tuple(MusicScene(scene_config) for scene_config in scenes)
         self._currently_playing = None
+        self._track_queues = {}
+        self._track_queue_futures = {}
+        self._last_track_list_name = None
+        self._current_entry = None
+        self._current_source = None
+        self._current_track_queue = None
+        # Held while the playback is changed, so concurrent requests cannot both start to play a track list
+        self._playback_lock = asyncio.Lock()
+        self.durations = DurationCache(os.path.join(cache.CACHE_DIR, "durations.json"))
+        self.pcm_cache = PCMCache(config["pcm_cache"] if "pcm_cache" in config else None, self.durations.get)
+        self.prefetcher = Prefetcher(self._get_track_queue, config["prefetch"] if "prefetch" in config else None)
+        self.play_history = PlayHistory(os.path.join(cache.CACHE_DIR, "play_history.json"))
+        self.resume_positions = ResumePositions(os.path.join(cache.CACHE_DIR, "resume_positions.json"))
         self.is_cancelled = False
         self.callback_handler = MusicCallbackHandler(callback_fn=callback_fn)
-        MusicChecker().do_all_checks(self.groups, self.directory)
+        MusicChecker().do_all_checks(self.groups, self.directory, self.scenes, check_ytdl_version=not is_warm_start)
+        self._track_list_indices = {
+            track_list.name: (group_index, track_list_index)
+            for group_index, group in enumerate(self.groups)
+            for track_list_index, track_list in enumerate(group.track_lists)
+        }
+        self.scene_plans = {scene.name: self._create_scene_plan(scene) for scene in self.scenes}
+        self._scene_task = None
+        self.search_index = MusicSearchIndex(self.groups)
+        self.audio_engine = None
+        audio_engine_config = config["audio_engine"] if "audio_engine" in config else {}
+        if "enabled" in audio_engine_config and audio_engine_config["enabled"]:
+            if AudioEngine.is_available():
+                self.audio_engine = AudioEngine(audio_engine_config)
+                self.prefetcher.prespawn = False  # The engine runs its own decoders
+            else:
+                logger.warning("The audio engine requires Python 3.8 or later, decoding in the bot process instead.")
         self.event_loop = asyncio.get_event_loop()
 
     def __eq__(self, other):
@@ -60,7 +120,7 @@ class MusicManager:
             for my_group, other_group in zip(self.groups, other.groups):
                 if my_group != other_group:
                     return False
-            return True
+            return self.scenes == other.scenes
         return False
 
     @property
@@ -79,71 +139,333 @@ class MusicManager:
             )
         return MusicState(None, None, None, None, self.volume, None)
 
+    @property
+    def playback_position(self) -> Optional[PlaybackPosition]:
+        """
+        Returns the position (in milliseconds) of the track that is currently being played or `None` if nothing is
+        being played. The duration is `None` if it has not been probed yet.
+        """
+        if self._current_source is None:
+            return None
+        entry = self._current_entry
+        duration = self.durations.get_known(entry.path)
+        if duration is not None:
+            duration = int(utils.get_playable_duration(entry.track, duration) * 1000)
+        return PlaybackPosition(entry.track.file, self._current_source.position, duration)
+
     async def cancel(self, discord_context):
         """
         If a track is currently being played, the replay will be cancelled.
         """
+        async with self._playback_lock:
+            await self._cancel(discord_context)
+
+    async def _cancel(self, discord_context):
+        self._save_resume_position()
         self.is_cancelled = True
         discord_context.voice_client.stop()
         while self._currently_playing is not None:
             await asyncio.sleep(0.01)
 
-    async def play_track_list(self, discord_context, request, group_index, track_list_index):
+    async def play_track_list(
+        self, discord_context, request, group_index, track_list_index, resume_position: ResumePosition = None
+    ):
         """
         If a track list is already being played, it will be cancelled and the new track list will be played.
+
+        :param resume_position: track and position at which to start, regardless of the `resume` attribute of the
+            track list (Optional, by default the track list is resumed where it was stopped if `resume` is set)
+        """
+        async with self._playback_lock:
+            await self._play_track_list(discord_context, request, group_index, track_list_index, resume_position)
+
+    async def _play_track_list(self, discord_context, request, group_index, track_list_index, resume_position=None):
+        """
+        Plays the track list, `self._playback_lock` must be held. The queue is created before the current track list
+        is cancelled, so it keeps playing if the new one cannot be played.
         """
-        if self._currently_playing is not None:
-            await self.cancel(discord_context)
         group = self.groups[group_index]
         track_list = group.track_lists[track_list_index]
-        logger.info(f"Loading '{track_list.name}'")
+        logger.info("Loading '%s'", track_list.name)
+        track_queue = await self._get_track_queue(group_index, track_list_index)
+        if self._currently_playing is not None:
+            await self._cancel(discord_context)
+        stored_resume_position = self.resume_positions.pop(track_list.name)
+        if resume_position is None and track_list.resume:
+            resume_position = stored_resume_position
+        position = 0
+        if resume_position is not None and track_queue.resume_at(resume_position.index, resume_position.file):
+            position = resume_position.position
+            logger.info("Resuming '%s' at %ds of %s", track_list.name, position // 1000, resume_position.file)
+        elif not track_queue.is_fresh:
+            track_queue.reset()
         self._currently_playing = _CurrentlyPlaying(group_index, track_list_index)
         await self.callback_handler(action=MusicActions.START, request=request, state=self.currently_playing)
-        await self._play_track(discord_context, request, group, track_list, track_list.tracks)
+        await self._play_track(discord_context, request, group, track_list, track_queue, position, is_locked=True)
+        self._record_transition(track_list.name)
+        self.prefetcher.prefetch(self._get_prefetch_candidates(group_index, track_list_index))
+
+    def _record_transition(self, track_list_name):
+        """
+        Records the transition from the previously played track list to the given one in the play history.
+        """
+        previous_name = self._last_track_list_name
+        self._last_track_list_name = track_list_name
+        if previous_name is None or previous_name == track_list_name:
+            return
+        self.play_history.record(previous_name, track_list_name)
+        self.event_loop.run_in_executor(None, self.play_history.write, self.play_history.serialize())
+
+    def _get_prefetch_candidates(self, group_index, track_list_index):
+        """
+        Returns the track lists that are likely to be played after the given one, most likely first.
+        The `next` track list comes first, followed by the track lists that were most frequently played after it.
+        """
+        track_list = self.groups[group_index].track_lists[track_list_index]
+        names = [] if track_list.next is None else [track_list.next]
+        names += self.play_history.most_frequent_successors(track_list.name, self.prefetcher.candidates)
+        candidates = []
+        for name in names:
+            key = self._track_list_indices.get(name)
+            if key is not None and key != (group_index, track_list_index) and key not in candidates:
+                candidates.append(key)
+        return candidates
+
+    @property
+    def resume_position(self) -> Optional[ResumePosition]:
+        """
+        Returns the track and position at which the current track list would be resumed, `None` if nothing is being
+        played.
+        """
+        if self._current_source is None:
+            return None
+        entry = self._current_entry
+        index = self._current_track_queue.index_of(entry)
+        return ResumePosition(index, entry.track.file, self._current_source.position)
 
-    async def _play_track(self, discord_context, request, group, track_list, tracks_to_play):
+    def _save_resume_position(self):
         """
-        Plays the given track from the given track list and group.
+        Stores the track and position at which the current track list is stopped, so it can be resumed there.
         """
+        position = self.resume_position
+        if position is None:
+            return
+        group_index, track_list_index = self._currently_playing
+        track_list = self.groups[group_index].track_lists[track_list_index]
+        if not track_list.resume:
+            return
+        self.resume_positions.save(track_list.name, position)
+        self.event_loop.run_in_executor(None, self.resume_positions.write, self.resume_positions.serialize())
+
+    async def restore(
+        self,
+        discord_context,
+        master_volume: Optional[int],
+        track_list_volumes: Dict[str, int],
+        track_list_name: Optional[str],
+        resume_position: Optional[ResumePosition],
+    ):
+        """
+        Restores the volumes of a previous session and continues to play its track list. Track lists that no longer
+        exist are ignored.
+
+        :param discord_context: discord context
+        :param master_volume: the master volume or `None` to keep the configured one
+        :param track_list_volumes: dictionary mapping the names of track lists to their volume
+        :param track_list_name: name of the track list that was being played or `None`
+        :param resume_position: the `ResumePosition` of that track list or `None`
+        """
+        if master_volume is not None:
+            self.volume = master_volume
+        for name, volume in track_list_volumes.items():
+            group_index, track_list_index = self._get_track_list_index_from_name(name)
+            if group_index is not None:
+                self.groups[group_index].track_lists[track_list_index].volume = volume
+        if track_list_name is None:
+            return
+        group_index, track_list_index = self._get_track_list_index_from_name(track_list_name)
+        if group_index is None:
+            logger.warning("Could not resume '%s' since there is no track list with that name", track_list_name)
+            return
+        await self.play_track_list(discord_context, None, group_index, track_list_index, resume_position)
+
+    async def _get_track_queue(self, group_index, track_list_index) -> TrackQueue:
+        """
+        Returns the `TrackQueue` of the given track list. It is created (and its tracks are resolved) on first use.
+        """
+        key = (group_index, track_list_index)
+        if key in self._track_queues:
+            return self._track_queues[key]
+        if key not in self._track_queue_futures:
+            group = self.groups[group_index]
+            track_list = group.track_lists[track_list_index]
+            create_queue = partial(TrackQueue, group, track_list, default_dir=self.directory)
+            self._track_queue_futures[key] = self.event_loop.run_in_executor(None, create_queue)
+        future = self._track_queue_futures[key]
+        try:
+            # Shielded since the queue may be requested by both a prefetch (that may be cancelled) and playback
+            track_queue = await asyncio.shield(future)
+        finally:
+            if future.done() and self._track_queue_futures.get(key) is future:
+                self._track_queue_futures.pop(key)
+        self._track_queues[key] = track_queue
+        return track_queue
+
+    async def _play_track(self, discord_context, request, group, track_list, track_queue, position=0, is_locked=False):
+        """
+        Plays the next track from the queue of the given track list and group from the given millisecond on.
+        `is_locked` is `True` if the caller holds `self._playback_lock` (the `after` callback of the player never
+        does, since `cancel()` waits for it while holding the lock).
+        """
+        self._current_entry = None
+        self._current_source = None
+        self._current_track_queue = None
         if self.is_cancelled:
             self._currently_playing = None
             self.is_cancelled = False
-            logger.info(f"Cancelled '{track_list.name}'")
+            logger.info("Cancelled '%s'", track_list.name)
             await self.callback_handler(action=MusicActions.STOP, request=request, state=self.currently_playing)
             return
-        if len(tracks_to_play) == 0:
-            if not track_list.loop:
-                self._currently_playing = None
-                logger.info(f"Finished '{track_list.name}'")
-                await self.callback_handler(action=MusicActions.FINISH, request=request, state=self.currently_playing)
-                if track_list.next is None:
-                    return
-                next_group_index, next_track_list_index = self._get_track_list_index_from_name(track_list.next)
-                if next_group_index is None or next_track_list_index is None:
-                    logger.error(f"Could not find a track list named '{track_list.next}'")
-                    return
+        entry = track_queue.pop()
+        if entry is None:
+            self._currently_playing = None
+            logger.info("Finished '%s'", track_list.name)
+            await self.callback_handler(action=MusicActions.FINISH, request=request, state=self.currently_playing)
+            if track_list.next is None:
+                return
+            next_group_index, next_track_list_index = self._get_track_list_index_from_name(track_list.next)
+            if next_group_index is None or next_track_list_index is None:
+                logger.error("Could not find a track list named '%s'", track_list.next)
+                return
+            if is_locked:
+                await self._play_track_list(discord_context, request, next_group_index, next_track_list_index)
+            else:
                 await self.play_track_list(discord_context, request, next_group_index, next_track_list_index)
+            return
+        if not os.path.isfile(entry.path):
+            try:
+                # The file was removed or downloaded again since the queue was created
+                new_entry = await self.event_loop.run_in_executor(None, track_queue.resolve, entry)
+            except ValueError:
+                self._currently_playing = None
+                logger.error("Stopped '%s' since %s cannot be found", track_list.name, entry.track.file)
+                await self.callback_handler(action=MusicActions.STOP, request=request, state=self.currently_playing)
                 return
-            tracks_to_play = track_list.tracks
-        track = tracks_to_play.pop(0)
-        path = utils.get_track_path(group, track_list, track, default_dir=self.directory)
-        ffmpeg_before_options = ""
-        if track.start_at is not None:
-            ffmpeg_before_options += f" -ss {track.start_at}ms"
-        if track.end_at is not None:
-            ffmpeg_before_options += f" -to {track.end_at}ms"
-        logger.info(f"Now Playing: {track.file}")
-        source = discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(path, before_options=ffmpeg_before_options))
-        volume = (self.volume * track_list.volume) // 100
-        source.volume = volume / 100
+            track_queue.replace(entry, new_entry)
+            entry = new_entry
+            if self.is_cancelled:  # Cancelled while the path was resolved
+                await self._play_track(discord_context, request, group, track_list, track_queue, is_locked=is_locked)
+                return
+        logger.info("Now Playing: %s", entry.track.file)
+        source = self._create_source(track_list, entry, position)
+        self._current_entry = entry
+        self._current_source = source
+        self._current_track_queue = track_queue
         discord_context.voice_client.play(
             source,
-            after=lambda e: logger.error(f"Player error: {e}")
+            after=lambda e: logger.error("Player error: %s", e)
             if e
             else asyncio.run_coroutine_threadsafe(
-                self._play_track(discord_context, request, group, track_list, tracks_to_play), self.event_loop
+                self._play_track(discord_context, request, group, track_list, track_queue), self.event_loop
             ),
         )
+        await self.callback_handler(action=MusicActions.POSITION, request=request, state=self.currently_playing)
+        if self.durations.get_known(entry.path) is None:
+            asyncio.ensure_future(self._announce_duration(request, entry))
+
+    def _create_source(self, track_list, entry, position=0) -> PositionTrackingAudio:
+        """
+        Returns a source playing the entry from the given millisecond on. If the audio engine is used, it decodes
+        the entry. Otherwise the decoded PCM is used if it is cached, else the prespawned decoder (if the track is
+        played from the start) or a new FFmpeg process.
+        """
+        volume = (self.volume * track_list.volume) // 100
+        if self.audio_engine is not None:
+            return self._create_engine_source(track_list, entry, position, volume / 100)
+        source = self.pcm_cache.get_source(entry, position) if track_list.loop else None
+        if source is None and position == 0:
+            source = self.prefetcher.take_prespawned(tuple(self._currently_playing), entry)
+        if source is None:
+            before_options = utils.get_ffmpeg_before_options(entry.track, position)
+            source = discord.FFmpegPCMAudio(entry.path, before_options=before_options)
+            if track_list.loop and self.pcm_cache.should_prepare(entry):
+                self.event_loop.run_in_executor(None, self.pcm_cache.prepare, entry)
+        return PositionTrackingAudio(source, volume=volume / 100, position=position)
+
+    def _create_engine_source(self, track_list, entry, position, volume) -> PositionTrackingAudio:
+        """
+        Returns a source playing the entry from the given millisecond on that is decoded by the audio engine. The
+        volume is applied by the engine as well.
+        """
+        pcm_path = self.pcm_cache.get_path(entry) if track_list.loop else None
+        if pcm_path is None and track_list.loop and self.pcm_cache.should_prepare(entry):
+            self.event_loop.run_in_executor(None, self.pcm_cache.prepare, entry)
+        before_options = utils.get_ffmpeg_before_options(entry.track, position)
+        source = self.audio_engine.play(entry.path, before_options, volume, pcm_path=pcm_path, position=position)
+        return PositionTrackingAudio(source, position=position)
+
+    def _set_source_volume(self, discord_context, volume):
+        """
+        Sets the volume (between 0 and 1) of the source that is currently being played.
+        """
+        if self.audio_engine is not None:
+            self.audio_engine.set_volume(volume)
+        else:
+            discord_context.voice_client.source.volume = volume
+
+    def prepare_scenes(self):
+        """
+        Creates the track queues of the track lists played by scenes in the background (see `_get_track_queue()`),
+        so a scene starts without resolving the tracks of its track list first.
+        """
+        self._scene_task = asyncio.ensure_future(self._prepare_scenes())
+
+    async def _prepare_scenes(self):
+        for plan in self.scene_plans.values():
+            if plan.play is None:
+                continue
+            try:
+                await self._get_track_queue(*plan.play)
+            except Exception:
+                logger.exception("Failed to prepare the track list of scene '%s'", plan.name)
+
+    def close(self):
+        """
+        Stops preparing the scenes and the audio engine (if it is used).
+        """
+        if self._scene_task is not None:
+            self._scene_task.cancel()
+            self._scene_task = None
+        if self.audio_engine is not None:
+            self.audio_engine.close()
+            self.audio_engine = None
+
+    async def _announce_duration(self, request, entry):
+        """
+        Probes the duration of the entry and notifies about the position again once it is known.
+        """
+        duration = await self.event_loop.run_in_executor(None, self.durations.get, entry.path)
+        if duration is not None and self._current_entry is entry:
+            await self.callback_handler(action=MusicActions.POSITION, request=request, state=self.currently_playing)
+
+    async def seek(self, discord_context, request, position):
+        """
+        Continues the current track at the given millisecond. Raises a `ValueError` if nothing is being played.
+
+        :param discord_context: discord context
+        :param request: the request that caused the action
+        :param position: millisecond of the track (relative to its `start_at`)
+        """
+        if self._current_source is None:
+            raise ValueError("Cannot seek since nothing is being played.")
+        group_index, track_list_index = self._currently_playing
+        track_list = self.groups[group_index].track_lists[track_list_index]
+        source = self._create_source(track_list, self._current_entry, position)
+        source.replace(self._current_source)
+        self._current_source = source
+        discord_context.voice_client.source = source
+        await self.callback_handler(action=MusicActions.POSITION, request=request, state=self.currently_playing)
+        logger.info("Seeked to %ds of %s", position // 1000, self._current_entry.track.file)
 
     def _get_track_list_index_from_name(self, name_of_track_list: str) -> Tuple[int, int]:
         """
@@ -153,15 +475,51 @@ class MusicManager:
         :param name_of_track_list: name of the track list
         :return: tuple of the form (<group_index>, <track_list_index>)
         """
-        next_group_index = None
-        next_track_list_index = None
-        for _group_index, _group in enumerate(self.groups):
-            for _track_list_index, _track_list in enumerate(_group.track_lists):
-                if _track_list.name == name_of_track_list:
-                    next_group_index = _group_index
-                    next_track_list_index = _track_list_index
-                    break
-        return next_group_index, next_track_list_index
+        return self._track_list_indices.get(name_of_track_list, (None, None))
+
+    def _create_scene_plan(self, scene: MusicScene) -> ScenePlan:
+        """
+        Resolves the track list names of the scene to their indices. The scene is expected to be checked already.
+        """
+        play = self._track_list_indices[scene.play] if scene.play is not None else None
+        track_list_volumes = tuple(
+            (*self._track_list_indices[name], volume) for name, volume in scene.track_list_volumes
+        )
+        return ScenePlan(scene.name, play, scene.volume, track_list_volumes)
+
+    async def play_scene(self, discord_context, request, scene_name):
+        """
+        Applies all volumes of the scene and then starts to play its track list (if it has one).
+
+        :param discord_context: discord context
+        :param request: the request that caused the action
+        :param scene_name: name of the scene
+        """
+        plan = self.scene_plans[scene_name]
+        if plan.master_volume is not None:
+            self.volume = plan.master_volume
+            await self.callback_handler(
+                action=MusicActions.MASTER_VOLUME, request=request, state=self.currently_playing
+            )
+        for group_index, track_list_index, volume in plan.track_list_volumes:
+            group = self.groups[group_index]
+            track_list = group.track_lists[track_list_index]
+            track_list.volume = volume
+            await self.callback_handler(
+                action=MusicActions.TRACK_LIST_VOLUME,
+                request=request,
+                state=MusicState(group_index, group.name, track_list_index, track_list.name, self.volume, volume),
+            )
+        logger.info("Playing scene '%s'", scene_name)
+        if plan.play is not None:
+            group_index, track_list_index = plan.play
+            await self.play_track_list(discord_context, request, group_index, track_list_index)
+        elif self._currently_playing is not None:
+            group_index = self._currently_playing.group_index
+            track_list_index = self._currently_playing.track_list_index
+            track_list = self.groups[group_index].track_lists[track_list_index]
+            new_volume = (self.volume * track_list.volume) // 100
+            self._set_source_volume(discord_context, new_volume / 100)
 
     async def set_master_volume(self, discord_context, request, volume):
         """
@@ -172,10 +530,10 @@ class MusicManager:
             track_list_index = self._currently_playing.track_list_index
             track_list = self.groups[group_index].track_lists[track_list_index]
             new_volume = (volume * track_list.volume) // 100
-            discord_context.voice_client.source.volume = new_volume / 100
+            self._set_source_volume(discord_context, new_volume / 100)
         self.volume = volume
         await self.callback_handler(action=MusicActions.MASTER_VOLUME, request=request, state=self.currently_playing)
-        logger.info(f"Changed music master volume to {volume}")
+        logger.info("Changed music master volume to %d", volume)
 
     async def set_track_list_volume(self, discord_context, request, group_index, track_list_index, volume):
         """
@@ -196,7 +554,7 @@ class MusicManager:
             and self._currently_playing.track_list_index == track_list_index
         ):
             new_volume = (self.volume * track_list.volume) // 100
-            discord_context.voice_client.source.volume = new_volume / 100
+            self._set_source_volume(discord_context, new_volume / 100)
         await self.callback_handler(
             action=MusicActions.TRACK_LIST_VOLUME,
             request=request,
@@ -204,4 +562,4 @@ class MusicManager:
                 group_index, group.name, track_list_index, track_list.name, self.volume, track_list.volume
             ),
         )
-        logger.info(f"Changed tracklist volume for group={group_index}, track_list={track_list_index} to {volume}")
+        logger.info("Changed tracklist volume for group=%d, track_list=%d to %d", group_index, track_list_index, volume)
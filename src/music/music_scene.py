@@ -0,0 +1,41 @@
+from collections import namedtuple
+from typing import Dict
+
+# A scene resolved against the loaded groups. `play` is a tuple (<group_index>, <track_list_index>) or `None` and
+# `track_list_volumes` is a tuple of (<group_index>, <track_list_index>, <volume>) tuples.
+ScenePlan = namedtuple("ScenePlan", ["name", "play", "master_volume", "track_list_volumes"])
+
+
+class MusicScene:
+
+    __slots__ = ("name", "play", "volume", "track_list_volumes")
+
+    def __init__(self, config: Dict):
+        """
+        Initializes a `MusicScene` instance.
+
+        A `MusicScene` is a named combination of actions that is applied in a single step.
+
+        The `config` parameter is expected to be a dictionary with the following keys:
+        - "name": the name of the scene
+        - "play": name of the track list to play (Optional)
+        - "volume": the master volume to set, an integer between 0 (mute) and 100 (max) (Optional)
+        - "track_list_volumes": a dictionary mapping track list names to their new volume (Optional)
+
+        :param config: `dict`
+        """
+        self.name = config["name"]
+        self.play = config["play"] if "play" in config else None
+        self.volume = int(config["volume"]) if "volume" in config else None
+        track_list_volumes = config["track_list_volumes"] if "track_list_volumes" in config else {}
+        self.track_list_volumes = tuple((name, int(volume)) for name, volume in track_list_volumes.items())
+
+    def __eq__(self, other):
+        if isinstance(other, MusicScene):
+            return (
+                self.name == other.name
+                and self.play == other.play
+                and self.volume == other.volume
+                and self.track_list_volumes == other.track_list_volumes
+            )
+        return False
@@ -0,0 +1,105 @@
+import bisect
+import difflib
+import itertools
+import re
+from collections import defaultdict, namedtuple
+from typing import Dict, Iterable, List
+
+from src.music.music_group import MusicGroup
+
+SearchResult = namedtuple("SearchResult", ["group_index", "group_name", "track_list_index", "track_list_name", "score"])
+
+# Matches are scored by how they were found. Exact token matches rank above prefix matches, which rank above
+# fuzzy matches. Scores of multiple query tokens add up.
+_EXACT_SCORE = 3
+_PREFIX_SCORE = 2
+_FUZZY_SCORE = 1
+
+
+class MusicSearchIndex:
+
+    _token_regex = re.compile(r"\w+")
+
+    def __init__(self, groups: Iterable[MusicGroup], fuzzy_cutoff: float = 0.75):
+        """
+        Initializes a `MusicSearchIndex` instance.
+
+        The index maps every token of the group names, the track list names and the track list tags to the
+        track lists they belong to. A token of a group name refers to all track lists of the group.
+        It is built once and is not updated if the groups change.
+
+        :param groups: `MusicGroup` instances to index
+        :param fuzzy_cutoff: similarity between 0 and 1 a token needs to be considered a fuzzy match
+        """
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._entries = []
+        postings = defaultdict(set)
+        for group_index, group in enumerate(groups):
+            group_tokens = self.tokenize(group.name)
+            for track_list_index, track_list in enumerate(group.track_lists):
+                entry_index = len(self._entries)
+                self._entries.append((group_index, group.name, track_list_index, track_list.name))
+                tokens = set(group_tokens)
+                tokens.update(self.tokenize(track_list.name))
+                for tag in track_list.tags:
+                    tokens.update(self.tokenize(tag))
+                for token in tokens:
+                    postings[token].add(entry_index)
+        self._postings = {token: frozenset(entry_indices) for token, entry_indices in postings.items()}
+        self._sorted_tokens = sorted(self._postings)
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """
+        Splits the text into lowercase tokens.
+        """
+        return cls._token_regex.findall(text.lower())
+
+    def search(self, query: str, limit: int = 20) -> List[SearchResult]:
+        """
+        Returns the track lists matching the query, best matches first.
+
+        Every token of the query is matched exactly, as prefix and fuzzy against the indexed tokens. A track list
+        is only returned if every token of the query matches.
+
+        :param query: the search query
+        :param limit: maximum number of results
+        """
+        query_tokens = self.tokenize(query)
+        if len(query_tokens) == 0:
+            return []
+        scores = None
+        for query_token in query_tokens:
+            token_scores = self._score_token(query_token)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    entry_index: score + token_scores[entry_index]
+                    for entry_index, score in scores.items()
+                    if entry_index in token_scores
+                }
+            if len(scores) == 0:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [SearchResult(*self._entries[entry_index], score) for entry_index, score in ranked]
+
+    def _score_token(self, query_token: str) -> Dict[int, int]:
+        """
+        Returns a dictionary mapping the index of every matching entry to the best score of the query token.
+        """
+        scores = {}
+
+        def add_matches(token, score):
+            for entry_index in self._postings[token]:
+                if scores.get(entry_index, 0) < score:
+                    scores[entry_index] = score
+
+        start = bisect.bisect_left(self._sorted_tokens, query_token)
+        for token in itertools.islice(self._sorted_tokens, start, None):
+            if not token.startswith(query_token):
+                break
+            add_matches(token, _EXACT_SCORE if token == query_token else _PREFIX_SCORE)
+        for token in difflib.get_close_matches(query_token, self._sorted_tokens, n=5, cutoff=self.fuzzy_cutoff):
+            add_matches(token, _FUZZY_SCORE)
+        return scores
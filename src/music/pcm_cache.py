@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import mmap
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import discord
+from src import cache
+from src.logging_config import stream_handler
+from src.music import utils
+from src.music.track_queue import QueueEntry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+# 20ms of 16-bit 48kHz stereo PCM, the frame size discord.py expects
+FRAME_SIZE = 3840
+_BYTES_PER_SECOND = FRAME_SIZE * 50
+
+
+class PCMMapping:
+    def __init__(self, pcm: mmap.mmap):
+        """
+        Initializes a `PCMMapping` instance.
+
+        Counts the sources reading from the memory-mapped PCM data, so the mapping is only closed once it has been
+        evicted from the `PCMCache` and no source reads from it anymore. Sources are created on the event loop but
+        cleaned up by the player thread, so the count is guarded by a lock.
+
+        :param pcm: the memory-mapped PCM data
+        """
+        self.pcm = pcm
+        self._readers = 0
+        self._is_evicted = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self._readers += 1
+
+    def release(self):
+        with self._lock:
+            self._readers -= 1
+            self._close_if_unused()
+
+    def evict(self):
+        with self._lock:
+            self._is_evicted = True
+            self._close_if_unused()
+
+    def _close_if_unused(self):
+        if self._is_evicted and self._readers == 0:
+            self.pcm.close()
+
+
+class MemoryMappedPCMAudio(discord.AudioSource):
+    def __init__(self, mapping: PCMMapping, position: int = 0):
+        """
+        Initializes a `MemoryMappedPCMAudio` instance.
+
+        Plays raw 16-bit 48kHz stereo PCM from a memory-mapped file, so reading a frame does not perform a syscall.
+        Every frame is copied out of the mapping as `bytes`, since the Opus encoder of discord.py does not accept a
+        `memoryview`.
+
+        :param mapping: the memory-mapped PCM data, it is released once the source is cleaned up
+        :param position: millisecond at which to start playing
+        """
+        mapping.acquire()
+        self._mapping = mapping
+        self._view = memoryview(mapping.pcm)
+        self._end = (len(mapping.pcm) // FRAME_SIZE) * FRAME_SIZE  # A trailing partial frame is dropped
+        self._position = min((position // 20) * FRAME_SIZE, self._end)
+
+    def read(self):
+        if self._view is None or self._position >= self._end:
+            return b""
+        frame = bytes(self._view[self._position : self._position + FRAME_SIZE])
+        self._position += FRAME_SIZE
+        return frame
+
+    def cleanup(self):
+        if self._view is None:
+            return  # Also called when the source is garbage collected
+        self._view.release()  # A mapping cannot be closed while it is exported to a memoryview
+        self._view = None
+        self._mapping.release()
+
+
+class PCMCache:
+    def __init__(self, config: Dict = None, get_duration: Callable[[str], Optional[float]] = utils.probe_duration):
+        """
+        Initializes a `PCMCache` instance.
+
+        Tracks that are not longer than `max_duration` are decoded once to raw PCM in the background and stored in
+        `cache.PCM_DIR`. Once decoded, they are played from a memory-mapped file instead of spawning FFmpeg.
+        At most `memory_budget` megabytes are mapped at once, the least recently played files are unmapped first.
+
+        The `config` parameter is expected to be a dictionary with the following keys:
+        - "max_duration": tracks up to this many seconds are decoded (Optional, default=60)
+        - "memory_budget": maximum number of megabytes that are mapped at once (Optional, default=256)
+
+        :param config: `dict`
+        :param get_duration: function returning the duration of a file in seconds (or `None`)
+        """
+        config = config if config is not None else {}
+        self.get_duration = get_duration
+        self.max_duration = float(config["max_duration"]) if "max_duration" in config else 60
+        self.memory_budget = int(config["memory_budget"] if "memory_budget" in config else 256) * 1024 * 1024
+        self._decoded_files = {}  # entry key -> path of the decoded PCM file
+        self._unsuitable = set()  # entry keys that are too long or could not be decoded
+        self._decoding = set()  # entry keys that are being decoded
+        self._lock = threading.Lock()
+        self._mapped = OrderedDict()  # entry key -> PCMMapping, least recently used first
+        self._mapped_size = 0
+
+    @staticmethod
+    def _get_key(entry: QueueEntry) -> str:
+        return f"{entry.path}|{entry.ffmpeg_before_options}"
+
+    def get_source(self, entry: QueueEntry, position: int = 0) -> Optional[MemoryMappedPCMAudio]:
+        """
+        Returns a source playing the decoded entry from the given millisecond on or `None` if it has not been
+        decoded (yet).
+        """
+        key = self._get_key(entry)
+        mapping = self._mapped.get(key)
+        if mapping is None:
+            pcm_path = self._decoded_files.get(key)
+            if pcm_path is None:
+                return None
+            mapping = self._map(key, pcm_path)
+            if mapping is None:
+                return None
+        else:
+            self._mapped.move_to_end(key)
+        return MemoryMappedPCMAudio(mapping, position)
+
+    def get_path(self, entry: QueueEntry) -> Optional[str]:
+        """
+        Returns the path of the decoded PCM file of the entry or `None` if it has not been decoded (yet).
+        """
+        return self._decoded_files.get(self._get_key(entry))
+
+    def _map(self, key: str, pcm_path: str) -> Optional[PCMMapping]:
+        """
+        Maps the PCM file into memory, evicting the least recently used files to stay within the budget (they are
+        unmapped once no source plays them anymore). Returns `None` if the file alone exceeds the budget or could
+        not be mapped.
+        """
+        try:
+            size = os.path.getsize(pcm_path)
+            if size == 0 or size > self.memory_budget:
+                return None
+            while self._mapped_size + size > self.memory_budget:
+                _, evicted = self._mapped.popitem(last=False)
+                self._mapped_size -= len(evicted.pcm)
+                evicted.evict()
+            with open(pcm_path, "rb") as file:
+                pcm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            logger.exception("Could not map %s", pcm_path)
+            return None
+        mapping = PCMMapping(pcm)
+        self._mapped[key] = mapping
+        self._mapped_size += size
+        return mapping
+
+    def should_prepare(self, entry: QueueEntry) -> bool:
+        """
+        Returns `True` if the entry has neither been decoded nor been found to be unsuitable yet.
+        """
+        key = self._get_key(entry)
+        return key not in self._decoded_files and key not in self._unsuitable and key not in self._decoding
+
+    def prepare(self, entry: QueueEntry):
+        """
+        Decodes the entry if it is short enough and has not been decoded yet. This blocks, so call it from a
+        background thread.
+        """
+        key = self._get_key(entry)
+        with self._lock:
+            if key in self._decoded_files or key in self._unsuitable or key in self._decoding:
+                return
+            self._decoding.add(key)
+        try:
+            pcm_path = self._decode(entry)
+            with self._lock:
+                if pcm_path is None:
+                    self._unsuitable.add(key)
+                else:
+                    self._decoded_files[key] = pcm_path
+        finally:
+            with self._lock:
+                self._decoding.discard(key)
+
+    def _decode(self, entry: QueueEntry) -> Optional[str]:
+        """
+        Decodes the entry to a PCM file unless it is too long. Returns the path of the file or `None`.
+        """
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            return None
+        key = f"{entry.path}|{stat.st_size}|{stat.st_mtime_ns}|{entry.ffmpeg_before_options}"
+        pcm_path = os.path.join(cache.PCM_DIR, hashlib.sha1(key.encode()).hexdigest() + ".pcm")
+        if os.path.isfile(pcm_path):
+            return pcm_path
+        duration = self.get_duration(entry.path)
+        if duration is None:
+            return None
+        duration = utils.get_playable_duration(entry.track, duration)
+        if duration > self.max_duration or duration * _BYTES_PER_SECOND > self.memory_budget:
+            return None
+        temp_path = pcm_path + ".part"
+        command = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+        command += entry.ffmpeg_before_options.split()
+        command += ["-i", entry.path, "-f", "s16le", "-ar", "48000", "-ac", "2", "-y", temp_path]
+        try:
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            os.replace(temp_path, pcm_path)
+        except (OSError, subprocess.SubprocessError):
+            logger.warning("Could not decode %s", entry.path)
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return None
+        logger.info("Decoded %s for playback from memory", entry.track.file)
+        return pcm_path
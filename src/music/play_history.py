@@ -0,0 +1,65 @@
+import json
+import logging
+from collections import Counter, defaultdict
+from typing import List
+
+from src.atomic_file import write_atomically
+from src.logging_config import stream_handler
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+
+class PlayHistory:
+    def __init__(self, path: str):
+        """
+        Initializes a `PlayHistory` instance.
+
+        Counts how often a track list was followed by another one. The counts are loaded from and saved to the
+        JSON file at `path`, so they carry over between sessions.
+
+        :param path: path of the JSON file
+        """
+        self.path = path
+        self._successors = defaultdict(Counter)
+        try:
+            with open(path, "r") as file:
+                for name, successors in json.load(file).items():
+                    self._successors[name].update(successors)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError):
+            logger.warning("Could not read the play history at %s, starting with an empty one.", path)
+
+    def record(self, previous_name: str, name: str):
+        """
+        Records that the track list named `name` was played after the one named `previous_name`.
+        """
+        self._successors[previous_name][name] += 1
+
+    def most_frequent_successors(self, name: str, n: int) -> List[str]:
+        """
+        Returns the names of (at most) `n` track lists that were most frequently played after the given one.
+        """
+        if name not in self._successors:
+            return []
+        return [successor for successor, _ in self._successors[name].most_common(n)]
+
+    def serialize(self) -> str:
+        """
+        Returns the history as JSON string.
+        """
+        return json.dumps(self._successors)
+
+    def write(self, data: str):
+        """
+        Writes the serialized history to its file (see `write_atomically()`). This blocks, so call it from a
+        background thread.
+
+        :param data: the result of `serialize()`
+        """
+        try:
+            write_atomically(self.path, data)
+        except OSError:
+            logger.warning("Could not save the play history to %s", self.path)
@@ -0,0 +1,127 @@
+import json
+import logging
+from collections import namedtuple
+from typing import Optional
+
+import discord
+from src.atomic_file import write_atomically
+from src.logging_config import stream_handler
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+# Milliseconds of audio in a single frame read by discord.py
+FRAME_DURATION = 20
+
+# Position of the track that is currently being played, `duration` is `None` if it is not known (yet)
+PlaybackPosition = namedtuple("PlaybackPosition", ["file", "position", "duration"])
+
+# Track (index in the track list and file) and millisecond at which to resume a track list
+ResumePosition = namedtuple("ResumePosition", ["index", "file", "position"])
+
+
+class PositionTrackingAudio(discord.PCMVolumeTransformer):
+    def __init__(self, original: discord.AudioSource, volume: float = 1.0, position: int = 0):
+        """
+        Initializes a `PositionTrackingAudio` instance.
+
+        Transforms the volume of the `original` source and counts the frames read from it, so the playback position
+        is known without asking FFmpeg.
+
+        A source whose `applies_volume` attribute is `True` (e.g., `RingBufferAudio`) already returns its frames at
+        the right volume, so they are passed through. Frames read while its `is_filler` attribute is `True` (silence
+        played while its decoder falls behind) are not counted.
+
+        :param original: the source to play
+        :param volume: the volume as float between 0 and 1 (or higher)
+        :param position: millisecond of the track at which `original` starts
+        """
+        super().__init__(original, volume=volume)
+        self.start_position = position
+        self.frames_read = 0
+        self._replaced_source = None
+
+    def replace(self, source: discord.AudioSource):
+        """
+        Cleans up `source` (the source this one replaces in the player) on the first read or once this source is
+        cleaned up. The player thread may still be reading from `source` when the source of the player is replaced,
+        so it must not be cleaned up right away.
+        """
+        self._replaced_source = source
+
+    def read(self):
+        if self._replaced_source is not None:
+            self._cleanup_replaced_source()
+        data = self.original.read() if getattr(self.original, "applies_volume", False) else super().read()
+        if data and not getattr(self.original, "is_filler", False):
+            self.frames_read += 1
+        return data
+
+    @property
+    def position(self) -> int:
+        """
+        Returns the millisecond of the track that is currently being played.
+        """
+        return self.start_position + self.frames_read * FRAME_DURATION
+
+    def cleanup(self):
+        self._cleanup_replaced_source()
+        super().cleanup()
+
+    def _cleanup_replaced_source(self):
+        source, self._replaced_source = self._replaced_source, None
+        if source is not None:
+            source.cleanup()
+
+
+class ResumePositions:
+    def __init__(self, path: str):
+        """
+        Initializes a `ResumePositions` instance.
+
+        Stores the track and position at which each track list was stopped, so it can be resumed there. The
+        positions are loaded from and saved to the JSON file at `path`, so they carry over between sessions.
+
+        :param path: path of the JSON file
+        """
+        self.path = path
+        self._positions = {}  # track list name -> ResumePosition
+        try:
+            with open(path, "r") as file:
+                for name, position in json.load(file).items():
+                    self._positions[name] = ResumePosition(*position)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError):
+            logger.warning("Could not read the resume positions at %s, all track lists start from the beginning.", path)
+
+    def save(self, name: str, position: ResumePosition):
+        """
+        Stores the position at which the track list named `name` was stopped.
+        """
+        self._positions[name] = position
+
+    def pop(self, name: str) -> Optional[ResumePosition]:
+        """
+        Removes and returns the position at which the track list named `name` was stopped, `None` if there is none.
+        """
+        return self._positions.pop(name, None)
+
+    def serialize(self) -> str:
+        """
+        Returns the positions as JSON string.
+        """
+        return json.dumps(self._positions)
+
+    def write(self, data: str):
+        """
+        Writes the serialized positions to their file (see `write_atomically()`). This blocks, so call it from a
+        background thread.
+
+        :param data: the result of `serialize()`
+        """
+        try:
+            write_atomically(self.path, data)
+        except OSError:
+            logger.warning("Could not save the resume positions to %s", self.path)
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import discord
+from src.logging_config import stream_handler
+from src.music import utils
+from src.music.track_queue import QueueEntry, TrackQueue
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+
+class Prefetcher:
+    def __init__(self, get_track_queue: Callable[[int, int], Awaitable[TrackQueue]], config: Dict = None):
+        """
+        Initializes a `Prefetcher` instance.
+
+        Prepares track lists that are likely to be played next: their track queue is created (resolving the paths
+        of all tracks), the first file is read into the OS page cache and, if `prespawn` is set, an FFmpeg
+        decoder is started for it. FFmpeg stops decoding once its output pipe is full, so the decoder waits
+        (paused) until it is played or discarded.
+
+        The `config` parameter is expected to be a dictionary with the following keys:
+        - "max_concurrent": maximum number of track lists that are prefetched at the same time (Optional, default=2)
+        - "candidates": number of track lists to prefetch after a track list starts (Optional, default=2)
+        - "prespawn": whether to start the decoder of the first track in advance (Optional, default=False)
+
+        :param get_track_queue: coroutine returning the `TrackQueue` of a (<group_index>, <track_list_index>)
+        :param config: `dict`
+        """
+        config = config if config is not None else {}
+        self.get_track_queue = get_track_queue
+        self.max_concurrent = int(config["max_concurrent"]) if "max_concurrent" in config else 2
+        self.candidates = int(config["candidates"]) if "candidates" in config else 2
+        self.prespawn = bool(config["prespawn"]) if "prespawn" in config else False
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._tasks = {}  # (group_index, track_list_index) -> task
+        self._prespawned = {}  # (group_index, track_list_index) -> (entry, source)
+
+    def prefetch(self, keys: Iterable[Tuple[int, int]]):
+        """
+        Schedules the prefetching of the given track lists. Previously prefetched track lists that are not among
+        them are discarded.
+
+        :param keys: tuples of the form (<group_index>, <track_list_index>) in order of priority
+        """
+        keys = list(keys)[: self.candidates]
+        for key in list(self._tasks):
+            if key not in keys:
+                self._tasks.pop(key).cancel()
+        for key in list(self._prespawned):
+            if key not in keys:
+                self._discard_prespawned(key)
+        for key in keys:
+            if key not in self._tasks and key not in self._prespawned:
+                self._tasks[key] = asyncio.ensure_future(self._prefetch(key))
+
+    async def _prefetch(self, key: Tuple[int, int]):
+        """
+        Prefetches a single track list while respecting the limit of concurrent prefetches.
+        """
+        try:
+            async with self._semaphore:
+                track_queue = await self.get_track_queue(*key)
+                if not track_queue.is_fresh:
+                    track_queue.reset()
+                entry = track_queue.peek()
+                if entry is None:
+                    return
+                await asyncio.get_event_loop().run_in_executor(None, utils.warm_page_cache, entry.path)
+                if self.prespawn:
+                    source = discord.FFmpegPCMAudio(entry.path, before_options=entry.ffmpeg_before_options)
+                    self._prespawned[key] = (entry, source)
+                logger.debug("Prefetched %s", entry.track.file)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to prefetch group=%s, track_list=%s", key[0], key[1])
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                self._tasks.pop(key)
+
+    def take_prespawned(self, key: Tuple[int, int], entry: QueueEntry) -> Optional[discord.AudioSource]:
+        """
+        Returns the prespawned decoder of the given track list if it decodes the given entry, `None` otherwise.
+        A prespawned decoder that does not match is discarded.
+        """
+        if key not in self._prespawned:
+            return None
+        prespawned_entry, source = self._prespawned.pop(key)
+        if prespawned_entry is not entry:
+            source.cleanup()
+            return None
+        return source
+
+    def clear(self):
+        """
+        Cancels all prefetches and discards all prespawned decoders.
+        """
+        self.prefetch([])
+
+    def _discard_prespawned(self, key: Tuple[int, int]):
+        _, source = self._prespawned.pop(key)
+        source.cleanup()
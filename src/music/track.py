@@ -1,10 +1,14 @@
 import re
 import time
-from typing import Dict, Union
+from typing import Dict, Optional, Union
+
+from src.cache import get_youtube_id
 
 
 class Track:
 
+    __slots__ = ("file", "start_at", "end_at", "is_youtube_link", "youtube_id")
+
     youtube_regex = re.compile(r"^(http(s)?:\/\/)?((w){3}.)?youtu(be|.be)?(\.com)?\/.+")
 
     def __init__(self, config: Union[str, Dict]):
@@ -29,6 +33,8 @@ class Track:
             end_at = None if "end_at" not in config else config["end_at"]
         self.start_at = self._convert_formatted_time_to_ms(start_at) if start_at is not None else None
         self.end_at = self._convert_formatted_time_to_ms(end_at) if end_at is not None else None
+        self.is_youtube_link = self.youtube_regex.match(self.file) is not None
+        self.youtube_id = self._resolve_youtube_id() if self.is_youtube_link else None
 
     def _convert_formatted_time_to_ms(self, formatted_time: str) -> int:
         """
@@ -39,9 +45,14 @@ class Track:
         time_struct = time.strptime(formatted_time, "%H:%M:%S")
         return (time_struct.tm_sec + time_struct.tm_min * 60 + time_struct.tm_hour * 3600) * 1000
 
-    @property
-    def is_youtube_link(self):
-        return self.youtube_regex.match(self.file) is not None
+    def _resolve_youtube_id(self) -> Optional[str]:
+        """
+        Returns the id of the YouTube video `file` links to or `None` if it cannot be extracted.
+        """
+        try:
+            return get_youtube_id(self.file)
+        except ValueError:
+            return None
 
     def __eq__(self, other):
         if isinstance(other, Track):
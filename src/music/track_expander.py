@@ -0,0 +1,193 @@
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src import cache
+from src.atomic_file import write_atomically
+from src.logging_config import stream_handler
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+_AUDIO_EXTENSIONS = (".aac", ".flac", ".m4a", ".mp3", ".ogg", ".opus", ".wav", ".webm", ".wma")
+
+
+class TrackExpander:
+    def __init__(self, default_dir=None, config: Dict = None, ignore_ttl: bool = False):
+        """
+        Initializes a `TrackExpander` instance.
+
+        Expands track configs that stand for multiple tracks into the configs of the individual tracks:
+        - {"playlist": <url>}: every video in the YouTube playlist (or channel)
+        - {"glob": <pattern>}: every file matching the pattern relative to the directory of the track list. If the
+          pattern is a directory, every audio file in it
+
+        Other keys of such a track config (e.g., "start_at") are applied to every expanded track.
+
+        The videos of a playlist are fetched in parallel and stored in the cache, so they are only fetched again
+        once the stored result is older than `ttl` hours. If a playlist cannot be fetched, the stored result is
+        used regardless of its age.
+
+        The `config` parameter is expected to be a dictionary with the following keys:
+        - "max_concurrent": maximum number of playlists that are fetched at the same time (Optional, default=4)
+        - "ttl": number of hours after which a playlist is fetched again (Optional, default=24)
+
+        :param default_dir: the default directory to use if no other is specified
+        :param config: `dict`
+        :param ignore_ttl: whether to use the stored playlists regardless of their age (only playlists that were
+            never fetched are fetched)
+        """
+        config = config if config is not None else {}
+        self.default_dir = default_dir
+        self.max_concurrent = int(config["max_concurrent"]) if "max_concurrent" in config else 4
+        self.ttl = float(config["ttl"]) * 3600 if "ttl" in config else 24 * 3600
+        self.ignore_ttl = ignore_ttl
+        self.path = os.path.join(cache.CACHE_DIR, "playlists.json")
+
+    def expand(self, groups_config: List[Dict]) -> List[Dict]:
+        """
+        Returns a copy of the given group configs where every track config that stands for multiple tracks is
+        replaced by the configs of the individual tracks. Raises a `RuntimeError` if a track config cannot be
+        expanded or if all track configs of a track list were expanded to no tracks at all (track lists without
+        track configs are kept as they are).
+
+        :param groups_config: a list of configs for `MusicGroup` instances
+        """
+        playlists = self._get_playlists(
+            track_config["playlist"]
+            for group_config in groups_config
+            for track_list_config in group_config["track_lists"]
+            for track_config in track_list_config["tracks"]
+            if isinstance(track_config, dict) and "playlist" in track_config
+        )
+        expanded_groups_config = []
+        for group_config in groups_config:
+            expanded_track_lists_config = []
+            for track_list_config in group_config["track_lists"]:
+                tracks = []
+                for track_config in track_list_config["tracks"]:
+                    tracks.extend(self._expand_track(group_config, track_list_config, track_config, playlists))
+                if len(tracks) == 0 and len(track_list_config["tracks"]) > 0:
+                    logger.error("The track list %s does not contain any tracks", track_list_config["name"])
+                    raise RuntimeError(f"The track list {track_list_config['name']} does not contain any tracks.")
+                expanded_track_lists_config.append(dict(track_list_config, tracks=tracks))
+            expanded_groups_config.append(dict(group_config, track_lists=expanded_track_lists_config))
+        return expanded_groups_config
+
+    def _expand_track(self, group_config: Dict, track_list_config: Dict, track_config, playlists: Dict) -> List:
+        """
+        Returns the track configs the given track config stands for.
+        """
+        if not isinstance(track_config, dict):
+            return [track_config]
+        if "playlist" in track_config:
+            options = {key: value for key, value in track_config.items() if key != "playlist"}
+            return [dict(options, file=url) for url in playlists[track_config["playlist"]]]
+        if "glob" in track_config:
+            options = {key: value for key, value in track_config.items() if key != "glob"}
+            root_directory = self._get_root_directory(group_config, track_list_config)
+            files = self._glob(root_directory, track_config["glob"])
+            if len(files) == 0:
+                logger.warning("No files match %s in %s", track_config["glob"], root_directory)
+            return [dict(options, file=file) for file in files]
+        return [track_config]
+
+    def _get_root_directory(self, group_config: Dict, track_list_config: Dict) -> str:
+        """
+        Returns the root directory of the track list, see `utils.get_track_list_root_directory()`.
+        """
+        if "directory" in track_list_config:
+            return track_list_config["directory"]
+        if "directory" in group_config:
+            return group_config["directory"]
+        if self.default_dir is not None:
+            return self.default_dir
+        logger.error(
+            "Unknown directory for the track list %s. "
+            "You have to specify the directory on either the default level, "
+            "group level or track list level.",
+            track_list_config["name"],
+        )
+        raise RuntimeError(f"Missing directory for the track list {track_list_config['name']}.")
+
+    @staticmethod
+    def _glob(root_directory: str, pattern: str) -> List[str]:
+        """
+        Returns the files matching the pattern (relative to the root directory) sorted by their name.
+        """
+        path = os.path.join(root_directory, pattern)
+        if os.path.isdir(path):
+            files = [
+                os.path.join(path, file)
+                for file in os.listdir(path)
+                if os.path.splitext(file)[1].lower() in _AUDIO_EXTENSIONS
+            ]
+        else:
+            files = glob.glob(path, recursive=True)
+        return sorted(os.path.relpath(file, root_directory) for file in files if os.path.isfile(file))
+
+    def _get_playlists(self, urls) -> Dict[str, List[str]]:
+        """
+        Returns the video URLs for each of the given playlist URLs. Playlists that are not stored in the cache (or
+        whose stored result expired) are fetched in parallel.
+        """
+        urls = set(urls)
+        if len(urls) == 0:
+            return {}
+        stored = self._load()
+        now = time.time()
+        playlists = {url: stored[url]["videos"] for url in urls if url in stored}
+        expired_urls = [
+            url
+            for url in urls
+            if url not in stored or (not self.ignore_ttl and now - stored[url]["fetched_at"] > self.ttl)
+        ]
+        if len(expired_urls) == 0:
+            return playlists
+        logger.info("Fetching %d playlist(s)...", len(expired_urls))
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            results = list(zip(expired_urls, executor.map(self._fetch, expired_urls)))
+        for url, videos in results:
+            if videos is not None:
+                playlists[url] = videos
+                stored[url] = {"fetched_at": now, "videos": videos}
+            elif url in playlists:
+                logger.warning("Using the stored videos of the playlist %s instead", url)
+            else:
+                raise RuntimeError(f"Could not fetch the playlist {url}.")
+        self._save(stored)
+        return playlists
+
+    @staticmethod
+    def _fetch(url: str) -> Optional[List[str]]:
+        try:
+            videos = cache.get_playlist_video_urls(url)
+        except Exception:
+            logger.exception("Could not fetch the playlist %s", url)
+            return None
+        logger.info("Found %d video(s) in the playlist %s", len(videos), url)
+        return videos
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Could not read the stored playlists at %s, all playlists are fetched again.", self.path)
+            return {}
+
+    def _save(self, stored: Dict):
+        """
+        Saves the playlists (see `write_atomically()`).
+        """
+        try:
+            write_atomically(self.path, json.dumps(stored))
+        except OSError:
+            logger.warning("Could not save the playlists to %s", self.path)
@@ -1,10 +1,14 @@
 import random
-from typing import Dict, List
+import sys
+from typing import Dict, List, Tuple
 
 from src.music.track import Track
 
 
 class TrackList:
+
+    __slots__ = ("name", "directory", "volume", "loop", "shuffle", "next", "resume", "tags", "_tracks")
+
     def __init__(self, config: Dict):
         """
         Initializes a `TrackList` instance.
@@ -13,19 +17,25 @@ class TrackList:
         - "name": the name of the track list
         - "directory": the directory where the files for this track list are (Optional)
         - "volume": an integer between 0 (mute) and 100 (max) (Optional, default=100)
-        - "loop": bool indicating whether to loop once all tracks have been played (Optional, default=True)
-        - "shuffle": bool indicating whether to shuffle the tracks (Optional, default=True)
+        - "loop": bool indicating whether to loop once all tracks have been played (Optional, default=False)
+        - "shuffle": bool indicating whether to shuffle the tracks (Optional, default=False)
         - "next": name of the track list to play after this one finishes (Optional)
-        - "tracks": a list of track configs. See `Track` class for more information.
+        - "resume": bool indicating whether to continue where the track list was stopped (Optional, default=False)
+        - "tags": a list of keywords used to find the track list via search, converted to strings (Optional)
+        - "tracks": a list of track configs. See `Track` class for more information. Track configs that stand for
+          multiple tracks (playlists and globs) have to be expanded by a `TrackExpander` first.
 
         :param config: `dict`
         """
         self.name = config["name"]
-        self.directory = config["directory"] if "directory" in config else None
+        self.directory = sys.intern(config["directory"]) if "directory" in config else None
         self.volume = int(config["volume"]) if "volume" in config else 100
         self.loop = config["loop"] if "loop" in config else True
         self.shuffle = config["shuffle"] if "shuffle" in config else True
         self.next = config["next"] if "next" in config else None
+        self.resume = config["resume"] if "resume" in config else False
+        # YAML reads tags such as 1984 or yes as other types than strings
+        self.tags = tuple(str(tag) for tag in config["tags"]) if "tags" in config else ()
         tracks = [Track(track_config) for track_config in config["tracks"]]
         self._tracks = tuple(tracks)  # immutable
 
@@ -39,6 +49,13 @@ class TrackList:
             random.shuffle(tracks)
         return tracks
 
+    @property
+    def tracks_in_order(self) -> Tuple[Track, ...]:
+        """
+        Returns the tracks for this instance in the configured order without copying or shuffling them.
+        """
+        return self._tracks
+
     def __eq__(self, other):
         if isinstance(other, TrackList):
             attrs_are_the_same = (
@@ -48,6 +65,8 @@ class TrackList:
                 and self.shuffle == other.shuffle
                 and self.volume == other.volume
                 and self.next == other.next
+                and self.resume == other.resume
+                and self.tags == other.tags
             )
             if not attrs_are_the_same:
                 return False
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import random
+from collections import deque, namedtuple
+from typing import Optional
+
+from src.logging_config import stream_handler
+from src.music import utils
+from src.music.music_group import MusicGroup
+from src.music.track import Track
+from src.music.track_list import TrackList
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+QueueEntry = namedtuple("QueueEntry", ["track", "path", "ffmpeg_before_options"])
+
+
+class TrackQueue:
+    def __init__(self, group: MusicGroup, track_list: TrackList, default_dir=None, refill_threshold: int = 1):
+        """
+        Initializes a `TrackQueue` instance.
+
+        A `TrackQueue` holds the upcoming tracks of a single `TrackList`. The path and the FFmpeg options of every
+        track are resolved (and validated) once when the queue is created, so taking the next track is constant work.
+
+        If the track list loops, the queue is refilled with the next (shuffled) cycle on the event loop as soon as
+        at most `refill_threshold` entries are left. The first track of a new cycle is never the same as the last
+        track of the previous cycle (unless the track list only has a single track).
+
+        :param group: `MusicGroup` where the `track_list` is in
+        :param track_list: the `TrackList` to play
+        :param default_dir: the default directory to use if no other is specified
+        :param refill_threshold: number of remaining entries at which the next cycle is queued
+        """
+        self.group = group
+        self.track_list = track_list
+        self.default_dir = default_dir
+        self.refill_threshold = refill_threshold
+        self._entries = tuple(
+            self._create_entry(group, track_list, track, default_dir) for track in track_list.tracks_in_order
+        )
+        self._queue = deque()
+        self._last_entry = None
+        self._is_refill_scheduled = False
+        self.is_fresh = True
+        self.reset()
+
+    @staticmethod
+    def _create_entry(group: MusicGroup, track_list: TrackList, track: Track, default_dir) -> QueueEntry:
+        """
+        Resolves the path and the FFmpeg options of the given track.
+        """
+        path = utils.get_track_path(group, track_list, track, default_dir=default_dir)
+        return QueueEntry(track, path, utils.get_ffmpeg_before_options(track))
+
+    def resolve(self, entry: QueueEntry) -> QueueEntry:
+        """
+        Returns a copy of the entry with its path resolved again, e.g., since the file was downloaded again after the
+        queue was created. Raises a `ValueError` if the file cannot be found. This may block (see
+        `cache.get_path_of_youtube_id()`), so call it from a background thread.
+        """
+        return self._create_entry(self.group, self.track_list, entry.track, self.default_dir)
+
+    def replace(self, entry: QueueEntry, new_entry: QueueEntry):
+        """
+        Replaces every occurrence of the entry (e.g., with the result of `resolve()`).
+        """
+        self._entries = tuple(new_entry if queued is entry else queued for queued in self._entries)
+        self._queue = deque(new_entry if queued is entry else queued for queued in self._queue)
+        if self._last_entry is entry:
+            self._last_entry = new_entry
+
+    def reset(self):
+        """
+        Discards the remaining entries and queues a fresh cycle.
+        """
+        self._queue.clear()
+        self._last_entry = None
+        self.is_fresh = True
+        self._refill()
+
+    def resume_at(self, index: int, file: str) -> bool:
+        """
+        Discards the remaining entries and queues a fresh cycle that starts with the track at the given index. If
+        the track list is not shuffled, the cycle continues with the tracks after it. Returns `False` (and leaves the
+        queue as it is) if the track at the index is not the given file, e.g., because the track list changed.
+        """
+        if not 0 <= index < len(self._entries) or self._entries[index].track.file != file:
+            return False
+        entry = self._entries[index]
+        self._queue.clear()
+        self._last_entry = None
+        self.is_fresh = True
+        if self.track_list.shuffle:
+            self._refill()
+            self._queue.remove(entry)
+            self._queue.appendleft(entry)
+        else:
+            self._queue.extend(self._entries[index:])
+        return True
+
+    def index_of(self, entry: QueueEntry) -> int:
+        """
+        Returns the index of the entry's track in the track list.
+        """
+        return self._entries.index(entry)
+
+    def peek(self) -> Optional[QueueEntry]:
+        """
+        Returns the next entry without removing it or `None` if the queue is empty.
+        """
+        return self._queue[0] if len(self._queue) > 0 else None
+
+    def pop(self) -> Optional[QueueEntry]:
+        """
+        Returns the next entry or `None` if the track list does not loop and all tracks have been played (or it does
+        not have any tracks).
+        """
+        if len(self._queue) == 0:
+            if not self.track_list.loop or len(self._entries) == 0:
+                return None
+            self._refill()  # Only happens if the scheduled refill did not run yet
+        entry = self._queue.popleft()
+        self._last_entry = entry
+        self.is_fresh = False
+        if self.track_list.loop and len(self._queue) <= self.refill_threshold and not self._is_refill_scheduled:
+            self._is_refill_scheduled = True
+            asyncio.get_event_loop().call_soon(self._refill)
+        return entry
+
+    def _refill(self):
+        """
+        Appends the next cycle of entries to the queue. It is shuffled if `shuffle` is set on the track list.
+        """
+        self._is_refill_scheduled = False
+        if self.track_list.loop and len(self._queue) > self.refill_threshold:
+            return
+        entries = list(self._entries)
+        if self.track_list.shuffle:
+            random.shuffle(entries)
+            previous_entry = self._queue[-1] if len(self._queue) > 0 else self._last_entry
+            if len(entries) > 1 and entries[0] is previous_entry:
+                swap_index = random.randrange(1, len(entries))
+                entries[0], entries[swap_index] = entries[swap_index], entries[0]
+        self._queue.extend(entries)
@@ -1,8 +1,8 @@
 import logging
 import os
-from typing import Generator, Iterable, Tuple
+from typing import Generator, Iterable, Optional, Tuple
 
-from src import cache
+from src import cache, probe
 from src.logging_config import stream_handler
 from src.music.music_group import MusicGroup
 from src.music.track import Track
@@ -20,7 +20,7 @@ def music_tuple_generator(groups: Iterable[MusicGroup]) -> Generator[Tuple[Music
     """
     for group in groups:
         for track_list in group.track_lists:
-            for track in track_list.tracks:
+            for track in track_list.tracks_in_order:
                 yield (group, track_list, track)
 
 
@@ -58,22 +58,78 @@ def get_track_path(group: MusicGroup, track_list: TrackList, track: Track, defau
     :return: path to the `track` location that the VLC player can understand
     """
     if track.is_youtube_link:
-        file_path = os.path.join(cache.DOWNLOAD_DIR, cache.get_filename_of_youtube_url(track.file))
-        if not os.path.isfile(file_path):
-            logger.error(f"File {file_path} does not exist")
-            raise ValueError(f"The path {file_path} does not point to an existing file.")
+        file_path = cache.get_path_of_youtube_id(track.youtube_id) if track.youtube_id is not None else None
+        if file_path is None or not os.path.isfile(file_path):
+            logger.error("The audio of %s has not been downloaded", track.file)
+            raise ValueError(f"The audio of {track.file} is not in the cache.")
         return file_path
     try:
         root_directory = get_track_list_root_directory(group, track_list, default_dir=default_dir)
     except ValueError as error:
         logger.error(
-            f"Unknown directory for {track.file}. "
+            "Unknown directory for %s. "
             "You have to specify the directory on either the default level, "
-            "group level or track list level."
+            "group level or track list level.",
+            track.file,
         )
         raise error
     file_path = os.path.join(root_directory, track.file)
     if not os.path.isfile(file_path):
-        logger.error(f"File {file_path} does not exist")
+        logger.error("File %s does not exist", file_path)
         raise ValueError(f"The path {file_path} does not point to an existing file.")
     return file_path
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """
+    Returns the duration of the audio file in seconds using `ffprobe` or `None` if it could not be determined.
+    """
+    try:
+        return probe.probe_duration(path)
+    except (OSError, probe.ProbeError):
+        logger.warning("Could not determine the duration of %s", path)
+        return None
+
+
+def get_playable_duration(track: Track, duration: float) -> float:
+    """
+    Returns the number of seconds of the track that are played given the duration of its file, i.e., the duration
+    limited by `start_at` and `end_at`.
+    """
+    if track.end_at is not None:
+        duration = min(duration, track.end_at / 1000)
+    if track.start_at is not None:
+        duration -= track.start_at / 1000
+    return max(duration, 0)
+
+
+def get_ffmpeg_before_options(track: Track, position: int = 0) -> str:
+    """
+    Returns the FFmpeg input options to play the track from the given millisecond on. Seeking before the input
+    is fast since FFmpeg skips to the position instead of decoding up to it.
+    """
+    start_at = (track.start_at if track.start_at is not None else 0) + position
+    ffmpeg_before_options = ""
+    if start_at > 0:
+        ffmpeg_before_options += f" -ss {start_at}ms"
+    if track.end_at is not None:
+        ffmpeg_before_options += f" -to {track.end_at}ms"
+    return ffmpeg_before_options
+
+
+def warm_page_cache(path: str, max_bytes: int = 16 * 1024 * 1024):
+    """
+    Asks the OS to read the file into the page cache, so opening it later does not stall on a cold read.
+
+    Uses `posix_fadvise` where it is available, otherwise reads up to `max_bytes` of the file.
+    """
+    try:
+        with open(path, "rb") as file:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                return
+            remaining = max_bytes
+            while remaining > 0 and file.read(min(remaining, 1024 * 1024)):
+                remaining -= 1024 * 1024
+    except OSError:
+        logger.warning("Could not warm the page cache for %s", path)
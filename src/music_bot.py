@@ -13,8 +13,8 @@ logger.addHandler(stream_handler)
 class MusicBot(commands.Bot):
     def __init__(self, config_path, host, port):
         super().__init__(command_prefix=commands.when_mentioned_or("!"), description="D&DJ Music Bot")
-        server = MusicServer(config_path, host, port)
-        self.add_cog(server)
+        self.server = MusicServer(config_path, host, port)
+        self.add_cog(self.server)
 
     def run(self):
         with open(settings.TOKEN_FILE, "r") as file:
@@ -22,4 +22,5 @@ class MusicBot(commands.Bot):
             super().run(token)
 
     async def on_ready(self):
-        logger.info(f"Logged in as {self.user}")
+        logger.info("Logged in as %s", self.user)
+        await self.server.restore_session(self)
@@ -0,0 +1,130 @@
+import json
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+
+from src.music.music_manager import MusicManager
+
+Command = namedtuple("Command", ["action", "parameters"])
+
+# Maps every action a client can send to the parameters it requires
+ACTION_PARAMETERS = {
+    "playMusic": ("groupIndex", "trackListIndex"),
+    "stopMusic": (),
+    "setMusicMasterVolume": ("volume",),
+    "setTrackListVolume": ("groupIndex", "trackListIndex", "volume"),
+    "playScene": ("sceneName",),
+    "seek": ("position",),
+}
+
+# Parameters that are strings, all others are integers
+_STRING_PARAMETERS = ("sceneName",)
+
+
+class ProtocolError(ValueError):
+    def __init__(self, message: str, request_id: Optional[str] = None):
+        super().__init__(message)
+        self.request_id = request_id
+
+
+def parse_message(raw_data: str, music_manager: MusicManager) -> Tuple[Optional[str], List[Command]]:
+    """
+    Parses and validates a message sent by a client.
+
+    A message is a JSON object that either is a single action (e.g., `{"action": "stopMusic"}`) or a batch of
+    actions (e.g., `{"actions": [{"action": "stopMusic"}, ...]}`). Both may carry a "requestId" that is included
+    in the reply. Every action of a batch is validated before any is applied, so an invalid batch is rejected
+    as a whole. This includes whether something is being played when a "seek" is applied (taking the actions
+    before it into account). Actions that fail while they are applied are rolled back by the server.
+
+    Raises a `ProtocolError` if the message is invalid.
+
+    :param raw_data: the text of the websocket message
+    :param music_manager: the `MusicManager` whose groups, track lists and scenes the message must refer to
+    :return: tuple of the form (<request_id>, <commands>)
+    """
+    try:
+        data = json.loads(raw_data)
+    except ValueError:
+        raise ProtocolError("The message is not valid JSON.")
+    if not isinstance(data, dict):
+        raise ProtocolError("The message must be a JSON object.")
+    request_id = data.get("requestId")
+    if request_id is not None and not isinstance(request_id, (str, int)):
+        raise ProtocolError("The 'requestId' must be a string or an integer.")
+    if "actions" in data:
+        actions = data["actions"]
+        if not isinstance(actions, list) or len(actions) == 0:
+            raise ProtocolError("The 'actions' must be a non-empty list.", request_id)
+    else:
+        actions = [data]
+    commands = []
+    is_playing = music_manager.playback_position is not None
+    for index, action_dict in enumerate(actions):
+        try:
+            command = _parse_action(action_dict, music_manager)
+            is_playing = _check_preconditions(command, is_playing, music_manager)
+        except ProtocolError as error:
+            raise ProtocolError(f"Action {index}: {error}", request_id)
+        commands.append(command)
+    return request_id, commands
+
+
+def _check_preconditions(command: Command, is_playing: bool, music_manager: MusicManager) -> bool:
+    """
+    Raises a `ProtocolError` if the command cannot be applied in the given state.
+
+    :param command: the parsed command
+    :param is_playing: whether something will be played when the command is applied
+    :param music_manager: the `MusicManager` the command will be applied to
+    :return: whether something will be played after the command has been applied
+    """
+    if command.action == "seek" and not is_playing:
+        raise ProtocolError("Cannot seek since nothing is being played.")
+    if command.action == "playMusic":
+        return True
+    if command.action == "stopMusic":
+        return False
+    if command.action == "playScene" and music_manager.scene_plans[command.parameters["sceneName"]].play is not None:
+        return True
+    return is_playing
+
+
+def _parse_action(action_dict: Dict, music_manager: MusicManager) -> Command:
+    """
+    Parses and validates a single action. Raises a `ProtocolError` if it is invalid.
+    """
+    if not isinstance(action_dict, dict) or "action" not in action_dict:
+        raise ProtocolError("Expected an object with an 'action' key.")
+    action = action_dict["action"]
+    if action not in ACTION_PARAMETERS:
+        raise ProtocolError(f"Unknown action '{action}'.")
+    parameters = {}
+    for name in ACTION_PARAMETERS[action]:
+        if name not in action_dict:
+            raise ProtocolError(f"Missing parameter '{name}' for action '{action}'.")
+        if name in _STRING_PARAMETERS:
+            if not isinstance(action_dict[name], str):
+                raise ProtocolError(f"Parameter '{name}' for action '{action}' must be a string.")
+            parameters[name] = action_dict[name]
+            continue
+        value = action_dict[name]
+        try:
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise ValueError(value)  # Also rejects infinity and NaN
+            parameters[name] = int(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ProtocolError(f"Parameter '{name}' for action '{action}' must be an integer.")
+    if "volume" in parameters and not 0 <= parameters["volume"] <= 100:
+        raise ProtocolError("The volume must be between 0 and 100.")
+    if "position" in parameters and parameters["position"] < 0:
+        raise ProtocolError("The position must not be negative.")
+    if "groupIndex" in parameters:
+        group_index = parameters["groupIndex"]
+        if not 0 <= group_index < len(music_manager.groups):
+            raise ProtocolError(f"There is no group at index {group_index}.")
+        track_list_index = parameters["trackListIndex"]
+        if not 0 <= track_list_index < len(music_manager.groups[group_index].track_lists):
+            raise ProtocolError(f"There is no track list at index {track_list_index} in group {group_index}.")
+    if "sceneName" in parameters and parameters["sceneName"] not in music_manager.scene_plans:
+        raise ProtocolError(f"There is no scene named '{parameters['sceneName']}'.")
+    return Command(action, parameters)
@@ -1,7 +1,10 @@
 import asyncio
-import json
+import contextlib
 import logging
+import os
+import time
 import uuid
+from collections import namedtuple
 
 import aiohttp
 import aiohttp_jinja2
@@ -10,17 +13,48 @@ import yaml
 from aiohttp import web
 from aiohttp.abc import Request
 from discord.ext import commands
-from src import cache, settings
+from src import cache, logging_config, settings
 from src.loader import CustomLoader
 from src.logging_config import stream_handler
 from src.music.music_actions import MusicActions
 from src.music.music_manager import MusicManager
 from src.music.music_state import MusicState
+from src.music.pcm_cache import PCMCache
+from src.music.playback_position import ResumePosition
+from src.music_protocol import Command, ProtocolError, parse_message
+from src.profiling import LoopLagMonitor, SamplingProfiler
+from src.session_journal import SessionJournal
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.addHandler(stream_handler)
 
+# Seconds between two broadcasts of the playback position, clients interpolate in between
+_POSITION_TICK_INTERVAL = 5
+
+# Maximum number of characters of a message sent to Discord (the limit is 2000)
+_MAX_DISCORD_MESSAGE_LENGTH = 1900
+
+# Actions that change what is being played
+_PLAYBACK_ACTIONS = ("playMusic", "stopMusic", "playScene", "seek")
+
+# The volumes and the playback before a message is applied, restored if one of its actions fails
+_Snapshot = namedtuple("_Snapshot", ["master_volume", "track_list_volumes", "playing", "resume_position"])
+
+
+class _RestoredContext:
+    def __init__(self, guild):
+        """
+        Stands in for the context of the '!start' command when a session is restored.
+
+        :param guild: the guild whose voice channel the bot is connected to
+        """
+        self.guild = guild
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
 
 class MusicServer(commands.Cog):
     def __init__(self, config_path, host, port):
@@ -32,6 +66,19 @@ class MusicServer(commands.Cog):
         self.is_running = False
         self.config_path = config_path
         self.music_manager = None
+        self._command_lock = asyncio.Lock()
+        self._pending_broadcasts = None
+        self._position_tick_task = None
+        self.journal = SessionJournal(os.path.join(cache.CACHE_DIR, f"session-{port}.jsonl"))
+        self._profiler = SamplingProfiler(os.path.join(cache.CACHE_DIR, "profiles"))
+        self._loop_lag_monitor = LoopLagMonitor(
+            sections=[
+                (MusicServer, "_handle_message"),
+                (MusicServer, "_broadcast"),
+                (cache, "get_path_of_youtube_id"),
+                (PCMCache, "get_source"),
+            ]
+        )
 
     def _init_app(self):
         """
@@ -43,6 +90,8 @@ class MusicServer(commands.Cog):
         app.on_shutdown.append(self._shutdown_app)
         aiohttp_jinja2.setup(app, loader=jinja2.PackageLoader("src"))
         app.router.add_get("/", self.index)
+        app.router.add_get("/search", self.search)
+        app.router.add_get("/groups/{group_index}", self.group)
         app.router.add_static("/static/", path=settings.PROJECT_ROOT / "static", name="static")
         return app
 
@@ -61,17 +110,93 @@ class MusicServer(commands.Cog):
         if self.is_running:
             await ctx.send("The server is already running!")
             return
+        await self._start_server(ctx)
+        self.journal.reset({"running": True, "voiceChannelId": ctx.voice_client.channel.id})
+
+    async def restore_session(self, bot):
+        """
+        Restores the session that was running when the bot was shut down (or crashed): rejoins the voice channel,
+        starts the web server, restores the volumes and resumes the track list. Does nothing if no session was
+        running.
+
+        :param bot: the bot this cog is added to
+        """
+        session = self.journal.state
+        if self.is_running or not session["running"]:
+            return
+        started_at = time.perf_counter()
+        voice_channel = bot.get_channel(session["voiceChannelId"])
+        if voice_channel is None:
+            logger.warning("Could not restore the session since its voice channel does not exist anymore.")
+            self.journal.reset()
+            return
+        logger.info("Restoring the session in %s...", voice_channel.name)
+        resume_position = session["resumePosition"]
+        if resume_position is not None and resume_position[0] == session["playing"]:
+            resume_position = ResumePosition(*resume_position[1:])
+        else:
+            resume_position = None
+        try:
+            if voice_channel.guild.voice_client is None:
+                await voice_channel.connect()
+            discord_context = _RestoredContext(voice_channel.guild)
+            await self._start_server(discord_context, is_warm_start=True)
+            self.journal.reset(session)
+            await self.music_manager.restore(
+                discord_context,
+                session["masterVolume"],
+                dict(session["trackListVolumes"]),
+                session["playing"],
+                resume_position,
+            )
+        except Exception:
+            logger.exception("Failed to restore the session, type '!start' to start the server.")
+            await self._abort_restore(voice_channel.guild)
+            return
+        logger.info("Restored the session in %.2fs", time.perf_counter() - started_at)
+
+    async def _abort_restore(self, guild):
+        """
+        Undoes what a failed `restore_session()` has done so far (the web server, the music and the connection to the
+        voice channel), so the server can be started with '!start'.
+        """
+        if self._position_tick_task is not None:
+            self._position_tick_task.cancel()
+            self._position_tick_task = None
+        if self.is_running:
+            try:
+                await self.music_manager.cancel(self.discord_context)
+            except Exception:
+                logger.exception("Failed to stop the music of the session that could not be restored.")
+            await self.runner.cleanup()
+            self.is_running = False
+        if self.music_manager is not None:
+            self.music_manager.prefetcher.clear()
+            self.music_manager.close()  # The audio engine is started as soon as the manager is created
+        if guild.voice_client is not None:
+            await guild.voice_client.disconnect()
+        cache.release()
+        self.journal.append({"running": False})
+        logging_config.set_session_id(None)
+
+    async def _start_server(self, discord_context, is_warm_start=False):
+        """
+        Loads the config and starts the web server.
+        """
+        logging_config.set_session_id(uuid.uuid4().hex[:8])
         cache.prepare()
         with open(self.config_path) as config_file:
             config = yaml.load(config_file, Loader=CustomLoader)
-        self.music_manager = MusicManager(config["music"], self.on_state_change)
-        self.discord_context = ctx
+        self.music_manager = MusicManager(config["music"], self.on_state_change, is_warm_start=is_warm_start)
+        self.music_manager.prepare_scenes()
+        self.discord_context = discord_context
         self.runner = web.AppRunner(self.app)
         await self.runner.setup()
         site = web.TCPSite(self.runner, self.host, self.port)
-        logger.info(f"Server started on http://{self.host}:{self.port}")
+        logger.info("Server started on http://%s:%s", self.host, self.port)
         self.is_running = True
         await site.start()
+        self._position_tick_task = asyncio.ensure_future(self._broadcast_position_ticks())
 
     @commands.command()
     async def stop(self, ctx):
@@ -81,11 +206,17 @@ class MusicServer(commands.Cog):
         if not self.is_running:
             await ctx.send("The server is not running.")
             return
+        self._position_tick_task.cancel()
         await self.music_manager.cancel(self.discord_context)
+        self.music_manager.prefetcher.clear()
+        self.music_manager.close()
         await self.runner.cleanup()
         await self.discord_context.voice_client.disconnect()
+        cache.release()
         self.is_running = False
+        self.journal.append({"running": False})
         logger.info("Server shut down.")
+        logging_config.set_session_id(None)
 
     @commands.command()
     async def clear(self, ctx):
@@ -95,12 +226,85 @@ class MusicServer(commands.Cog):
         if self.is_running:
             await ctx.send("Cannot clear cache while the server is running (type '!stop' to stop it).")
             return
-        success = cache.clear_cache()
+        try:
+            success = cache.clear_cache()
+        except cache.CacheInUseException:
+            await ctx.send("Cannot clear cache while another bot process is using it.")
+            return
         if success:
             logger.info("Cleared cache.")
         else:
             logger.error("Failed to clear the cache.")
 
+    @commands.command()
+    async def scene(self, ctx, *, name):
+        """
+        Plays the scene with the given name.
+        """
+        if not self.is_running:
+            await ctx.send("The server is not running.")
+            return
+        if name not in self.music_manager.scene_plans:
+            await ctx.send(f"There is no scene named '{name}'.")
+            return
+        async with self._command_lock:
+            async with self._coalesced_broadcasts():
+                await self._play_scene(ctx, name)
+
+    @commands.command()
+    async def loglevel(self, ctx, level, name="src"):
+        """
+        Sets the log level (e.g., DEBUG) of the logger with the given name and its children (default: all loggers).
+        """
+        try:
+            logging_config.set_level(level, name)
+        except ValueError as error:
+            await ctx.send(str(error))
+            return
+        logger.info("Set the log level of '%s' to %s", name, level.upper())
+        await ctx.send(f"Set the log level of '{name}' to {level.upper()}.")
+
+    @commands.command()
+    async def profile(self, ctx, action):
+        """
+        Starts ('!profile start') or stops ('!profile stop') sampling the stacks of all threads. Once stopped, the
+        samples are written to the 'profiles' folder in the cache.
+        """
+        if action == "start":
+            if self._profiler.is_running:
+                await ctx.send("The profiler is already running.")
+                return
+            self._profiler.start()
+            logger.info("Started the profiler.")
+            await ctx.send("Started the profiler (type '!profile stop' to stop it).")
+        elif action == "stop":
+            if not self._profiler.is_running:
+                await ctx.send("The profiler is not running.")
+                return
+            loop = asyncio.get_event_loop()
+            path, sample_count = await loop.run_in_executor(None, self._profiler.stop)
+            await ctx.send(f"Wrote {sample_count} samples to '{path}'.")
+        else:
+            await ctx.send("Type '!profile start' or '!profile stop'.")
+
+    @commands.command()
+    async def looplag(self, ctx, seconds: float = 10):
+        """
+        Measures the lag of the event loop, the callbacks blocking it and the duration of the message handling,
+        broadcasts and cache lookups for the given number of seconds (default: 10).
+        """
+        if self._loop_lag_monitor.is_running:
+            await ctx.send("The event loop is already being measured.")
+            return
+        await ctx.send(f"Measuring the event loop for {seconds:g} seconds...")
+        self._loop_lag_monitor.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            report = self._loop_lag_monitor.stop()
+        logger.info("Event loop report:\n%s", report)
+        await ctx.send(f"```\n{report[:_MAX_DISCORD_MESSAGE_LENGTH]}\n```")
+
     @start.before_invoke
     async def ensure_voice(self, ctx):
         """
@@ -122,10 +326,54 @@ class MusicServer(commands.Cog):
                 "volume": self.music_manager.volume,
                 "currently_playing": self.music_manager.currently_playing,
                 "groups": self.music_manager.groups,
+                "scenes": self.music_manager.scenes,
             }
         }
         return aiohttp_jinja2.render_template("index.html", request, context)
 
+    async def search(self, request):
+        """
+        Returns the track lists matching the query parameter `q` as JSON (at most `limit` results, at least 1).
+        """
+        query = request.query.get("q", "")
+        try:
+            limit = max(int(request.query.get("limit", 20)), 1)
+        except ValueError:
+            raise web.HTTPBadRequest(text="The 'limit' parameter must be an integer.")
+        results = self.music_manager.search_index.search(query, limit=limit)
+        return web.json_response(
+            {
+                "results": [
+                    {
+                        "groupIndex": result.group_index,
+                        "groupName": result.group_name,
+                        "trackListIndex": result.track_list_index,
+                        "trackListName": result.track_list_name,
+                        "score": result.score,
+                    }
+                    for result in results
+                ]
+            }
+        )
+
+    async def group(self, request):
+        """
+        Returns the rendered track lists of a single group. The page loads them once the group is expanded.
+        """
+        try:
+            group_index = int(request.match_info["group_index"])
+        except ValueError:
+            raise web.HTTPNotFound()
+        if not 0 <= group_index < len(self.music_manager.groups):
+            raise web.HTTPNotFound()
+        group = self.music_manager.groups[group_index]
+        context = {
+            "music": {"currently_playing": self.music_manager.currently_playing},
+            "group": group,
+            "group_index": group_index,
+        }
+        return aiohttp_jinja2.render_template("_music_group.html", request, context)
+
     async def index(self, request):
         """
         Handles the client connection.
@@ -142,43 +390,163 @@ class MusicServer(commands.Cog):
         await task
 
     async def _handle_websocket_connection(self, request, ws, ws_identifier):
+        logging_config.client_id.set(ws_identifier)
         request.app["websockets"][ws_identifier] = ws
-        logger.info(f"Client {ws_identifier} connected.")
+        logger.info("Client %s connected.", ws_identifier)
         try:
+            if self.music_manager.playback_position is not None:
+                await self._reply(ws, self._get_position_message())
             while not ws.closed:
                 msg = await ws.receive()
-                await self._handle_message(request, msg)
+                if msg.type != aiohttp.WSMsgType.text:
+                    continue
+                await self._handle_message(request, ws, msg.data)
+        except asyncio.CancelledError:
+            raise
         except Exception:
-            pass
+            logger.exception("Unexpected error in the connection to client %s.", ws_identifier)
         finally:
-            logger.info(f"Client {ws_identifier} disconnected.")
+            logger.info("Client %s disconnected.", ws_identifier)
             request.app["websockets"].pop(ws_identifier, None)
             request.app["websocket_tasks"].pop(ws_identifier, None)
 
-    async def _handle_message(self, request, msg):
-        if msg.type != aiohttp.WSMsgType.text:
-            return
-        data_dict = json.loads(msg.data)
-        if "action" not in data_dict:
+    async def _handle_message(self, request, ws, raw_data):
+        """
+        Parses the message, applies its actions and replies to the sender.
+
+        All actions of a message are applied while holding `self._command_lock` and the state changes they cause
+        are broadcast once the whole message has been applied. If an action fails, the volumes and the playback are
+        restored to what they were before the message (see `_roll_back()`). The sender receives an "ack" containing
+        timings (in milliseconds) or an "error" if the message is invalid or could not be applied.
+        """
+        received_at = time.perf_counter()
+        try:
+            request_id, commands = parse_message(raw_data, self.music_manager)
+        except ProtocolError as error:
+            logger.warning("Received invalid message: %s", error)
+            await self._reply(ws, {"action": "error", "requestId": error.request_id, "message": str(error)})
             return
-        action = data_dict["action"]
-        if action == "playMusic":
-            if "groupIndex" in data_dict and "trackListIndex" in data_dict:
-                group_index = int(data_dict["groupIndex"])
-                track_list_index = int(data_dict["trackListIndex"])
-                await self._play_music(request, group_index, track_list_index)
-        elif action == "stopMusic":
+        parsed_at = time.perf_counter()
+        async with self._command_lock:
+            snapshot = self._get_snapshot()
+            try:
+                async with self._coalesced_broadcasts():
+                    applied_count = 0
+                    try:
+                        for command in commands:
+                            applied_count += 1  # A failing action may have been applied partially
+                            await self._apply_command(request, command)
+                    except Exception:
+                        await self._roll_back(request, snapshot, commands[:applied_count])
+                        raise
+                    finally:
+                        applied_at = time.perf_counter()
+            except Exception as error:
+                logger.exception("Failed to apply the actions of request %s.", request_id)
+                await self._reply(ws, {"action": "error", "requestId": request_id, "message": str(error)})
+                return
+        broadcast_at = time.perf_counter()
+        await self._reply(
+            ws,
+            {
+                "action": "ack",
+                "requestId": request_id,
+                "timings": {
+                    "parse": (parsed_at - received_at) * 1000,
+                    "apply": (applied_at - parsed_at) * 1000,
+                    "broadcast": (broadcast_at - applied_at) * 1000,
+                    "total": (broadcast_at - received_at) * 1000,
+                },
+            },
+        )
+
+    def _get_snapshot(self) -> _Snapshot:
+        """
+        Returns the current volumes and playback.
+        """
+        currently_playing = self.music_manager.currently_playing
+        playing = None
+        if currently_playing.group_index is not None:
+            playing = (currently_playing.group_index, currently_playing.track_list_index)
+        track_list_volumes = {
+            (group_index, track_list_index): track_list.volume
+            for group_index, group in enumerate(self.music_manager.groups)
+            for track_list_index, track_list in enumerate(group.track_lists)
+        }
+        return _Snapshot(self.music_manager.volume, track_list_volumes, playing, self.music_manager.resume_position)
+
+    async def _roll_back(self, request, snapshot: _Snapshot, applied_commands):
+        """
+        Restores the volumes and (if one of the applied commands changed it) the playback of the snapshot, so the
+        actions of a message are applied either all or none. The track list that was being played continues at the
+        position of the snapshot.
+        """
+        try:
+            if self.music_manager.volume != snapshot.master_volume:
+                await self._set_music_master_volume(request, snapshot.master_volume)
+            for (group_index, track_list_index), volume in snapshot.track_list_volumes.items():
+                if self.music_manager.groups[group_index].track_lists[track_list_index].volume != volume:
+                    await self._set_track_list_volume(request, group_index, track_list_index, volume)
+            if not any(command.action in _PLAYBACK_ACTIONS for command in applied_commands):
+                return
+            if snapshot.playing is None:
+                await self._stop_music()
+            else:
+                group_index, track_list_index = snapshot.playing
+                await self.music_manager.play_track_list(
+                    self.discord_context, request, group_index, track_list_index, snapshot.resume_position
+                )
+        except Exception:
+            logger.exception("Failed to roll back the actions of a message.")
+
+    async def _apply_command(self, request, command: Command):
+        """
+        Applies a single validated command.
+        """
+        parameters = command.parameters
+        if command.action == "playMusic":
+            await self._play_music(request, parameters["groupIndex"], parameters["trackListIndex"])
+        elif command.action == "stopMusic":
             await self._stop_music()
-        elif action == "setMusicMasterVolume":
-            if "volume" in data_dict:
-                volume = int(data_dict["volume"])
-                await self._set_music_master_volume(request, volume)
-        elif action == "setTrackListVolume":
-            if "groupIndex" in data_dict and "trackListIndex" in data_dict and "volume" in data_dict:
-                group_index = int(data_dict["groupIndex"])
-                track_list_index = int(data_dict["trackListIndex"])
-                volume = int(data_dict["volume"])
-                await self._set_track_list_volume(request, group_index, track_list_index, volume)
+        elif command.action == "setMusicMasterVolume":
+            await self._set_music_master_volume(request, parameters["volume"])
+        elif command.action == "setTrackListVolume":
+            await self._set_track_list_volume(
+                request, parameters["groupIndex"], parameters["trackListIndex"], parameters["volume"]
+            )
+        elif command.action == "playScene":
+            await self._play_scene(request, parameters["sceneName"])
+        elif command.action == "seek":
+            await self._seek(request, parameters["position"])
+
+    @contextlib.asynccontextmanager
+    async def _coalesced_broadcasts(self):
+        """
+        Collects the notifications of `on_state_change` while in the context and broadcasts them once it is left.
+        """
+        self._pending_broadcasts = {}
+        try:
+            yield
+        finally:
+            pending_broadcasts, self._pending_broadcasts = self._pending_broadcasts, None
+            await self._broadcast(list(pending_broadcasts.values()))
+
+    async def _reply(self, ws, message):
+        """
+        Sends the message to a single client. Does nothing if its connection has already been closed.
+        """
+        if not ws.closed:
+            await ws.send_json(message)
+
+    async def _broadcast(self, messages):
+        """
+        Sends the messages to every connected client. Multiple messages are sent as a single "batch" message.
+        """
+        if len(messages) == 0:
+            return
+        message = messages[0] if len(messages) == 1 else {"action": "batch", "messages": messages}
+        for ws in list(self.app["websockets"].values()):
+            await self._reply(ws, message)
 
     async def _play_music(self, request, group_index, track_list_index):
         """
@@ -198,6 +566,54 @@ class MusicServer(commands.Cog):
         """
         await self.music_manager.set_master_volume(self.discord_context, request, volume)
 
+    async def _play_scene(self, request, scene_name):
+        """
+        Plays the scene.
+        """
+        await self.music_manager.play_scene(self.discord_context, request, scene_name)
+
+    async def _seek(self, request, position):
+        """
+        Continues the current track at the given millisecond.
+        """
+        await self.music_manager.seek(self.discord_context, request, position)
+
+    async def _broadcast_position_ticks(self):
+        """
+        Broadcasts the playback position periodically, so clients can correct the position they interpolate.
+        """
+        while True:
+            await asyncio.sleep(_POSITION_TICK_INTERVAL)
+            if self.music_manager.playback_position is None:
+                continue
+            self._journal_resume_position()
+            if len(self.app["websockets"]) > 0:
+                await self._broadcast([self._get_position_message()])
+
+    def _journal_resume_position(self):
+        """
+        Journals the position at which the current track list would be resumed.
+        """
+        resume_position = self.music_manager.resume_position
+        if resume_position is not None:
+            resume_position = [self.music_manager.currently_playing.track_list_name, *resume_position]
+        self.journal.append({"resumePosition": resume_position})
+
+    def _get_position_message(self):
+        """
+        Returns the message containing the playback position (in milliseconds). The fields are `None` if nothing is
+        being played and the "duration" is `None` if it is not known (yet).
+        """
+        position = self.music_manager.playback_position
+        if position is None:
+            return {"action": "trackPosition", "file": None, "position": None, "duration": None}
+        return {
+            "action": "trackPosition",
+            "file": position.file,
+            "position": position.position,
+            "duration": position.duration,
+        }
+
     async def _set_track_list_volume(self, request, group_index, track_list_index, volume):
         """
         Sets the volume for a specific track list.
@@ -206,44 +622,67 @@ class MusicServer(commands.Cog):
             self.discord_context, request, group_index, track_list_index, volume
         )
 
+    def _journal_state_change(self, action: MusicActions, state: MusicState):
+        """
+        Journals the change of the session state, so it can be restored by `restore_session()`.
+        """
+        if action == MusicActions.START:
+            self.journal.append({"playing": state.track_list_name, "resumePosition": None})
+        elif action in (MusicActions.STOP, MusicActions.FINISH):
+            self.journal.append({"playing": None, "resumePosition": None})
+        elif action == MusicActions.MASTER_VOLUME:
+            self.journal.append({"masterVolume": state.master_volume})
+        elif action == MusicActions.TRACK_LIST_VOLUME:
+            self.journal.append({"trackListVolume": [state.track_list_name, state.track_list_volume]})
+        elif action == MusicActions.POSITION:
+            self._journal_resume_position()
+
     async def on_state_change(self, action: MusicActions, request: Request, state: MusicState):
         """
         Callback function used by the `MusicManager` at `self.music`.
 
-        Notifies all connected web sockets about the changes.
+        Notifies all connected web sockets about the changes. While the actions of a message are being applied,
+        the notifications are collected instead and only the latest one per key is sent once all are applied.
         """
+        self._journal_state_change(action, state)
         if action == MusicActions.START:
             logger.debug("Music Callback: Start")
-            for ws in request.app["websockets"].values():
-                await ws.send_json(
-                    {
-                        "action": "nowPlaying",
-                        "groupIndex": state.group_index,
-                        "trackListIndex": state.track_list_index,
-                        "groupName": state.group_name,
-                        "trackName": state.track_list_name,
-                    }
-                )
+            key = "playback"
+            message = {
+                "action": "nowPlaying",
+                "groupIndex": state.group_index,
+                "trackListIndex": state.track_list_index,
+                "groupName": state.group_name,
+                "trackName": state.track_list_name,
+            }
         elif action == MusicActions.STOP:
             logger.debug("Music Callback: Stop")
-            for ws in request.app["websockets"].values():
-                await ws.send_json({"action": "musicStopped"})
+            key = "playback"
+            message = {"action": "musicStopped"}
         elif action == MusicActions.FINISH:
             logger.debug("Music Callback: Finish")
-            for ws in request.app["websockets"].values():
-                await ws.send_json({"action": "musicFinished"})
+            key = "playback"
+            message = {"action": "musicFinished"}
         elif action == MusicActions.MASTER_VOLUME:
             logger.debug("Music Callback: Master Volume")
-            for ws in request.app["websockets"].values():
-                await ws.send_json({"action": "setMusicMasterVolume", "volume": state.master_volume})
+            key = "masterVolume"
+            message = {"action": "setMusicMasterVolume", "volume": state.master_volume}
         elif action == MusicActions.TRACK_LIST_VOLUME:
             logger.debug("Music Callback: Track List Volume")
-            for ws in request.app["websockets"].values():
-                await ws.send_json(
-                    {
-                        "action": "setTrackListVolume",
-                        "groupIndex": state.group_index,
-                        "trackListIndex": state.track_list_index,
-                        "volume": state.track_list_volume,
-                    }
-                )
+            key = ("trackListVolume", state.group_index, state.track_list_index)
+            message = {
+                "action": "setTrackListVolume",
+                "groupIndex": state.group_index,
+                "trackListIndex": state.track_list_index,
+                "volume": state.track_list_volume,
+            }
+        elif action == MusicActions.POSITION:
+            logger.debug("Music Callback: Position")
+            key = "position"
+            message = self._get_position_message()
+        else:
+            return
+        if self._pending_broadcasts is not None:
+            self._pending_broadcasts[key] = message
+        else:
+            await self._broadcast([message])
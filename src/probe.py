@@ -0,0 +1,32 @@
+import subprocess
+
+
+class ProbeError(RuntimeError):
+    def __init__(self, path: str):
+        super().__init__(f"Could not probe the audio file {path}.")
+
+
+def probe_duration(path: str) -> float:
+    """
+    Returns the duration of the audio file in seconds using `ffprobe`.
+
+    Raises a `ProbeError` if `ffprobe` fails for the file, a `TimeoutError` if it takes too long (e.g., because the
+    disk is busy) and an `OSError` if `ffprobe` could not be run at all.
+    """
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        path,
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, timeout=30)
+        return float(result.stdout.decode().strip())
+    except subprocess.TimeoutExpired:
+        raise TimeoutError(f"Probing the audio file {path} timed out.")
+    except (subprocess.SubprocessError, ValueError):
+        raise ProbeError(path)
@@ -0,0 +1,235 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Iterable, List, Tuple
+
+from src.logging_config import stream_handler
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    return sorted_values[int(percentile * (len(sorted_values) - 1))]
+
+
+def _format_durations(durations: List[float]) -> str:
+    """
+    Returns the percentiles of the durations (in seconds) formatted in milliseconds.
+    """
+    durations = sorted(durations)
+    return "p50={:.1f}ms p90={:.1f}ms p99={:.1f}ms max={:.1f}ms".format(
+        *(_percentile(durations, percentile) * 1000 for percentile in (0.5, 0.9, 0.99, 1))
+    )
+
+
+class SamplingProfiler:
+    def __init__(self, directory: str, interval: float = 0.005):
+        """
+        Initializes a `SamplingProfiler` instance.
+
+        While running, a background thread takes the stack of every other thread (e.g., the event loop and the
+        audio player threads) every `interval` seconds. The samples are written as collapsed stacks (one line per
+        distinct stack, as used by flame graph tools) to a file in `directory` once it is stopped. Nothing is
+        sampled while it is not running.
+
+        :param directory: directory to write the profiles to
+        :param interval: seconds between two samples
+        """
+        self.directory = directory
+        self.interval = interval
+        self._stacks = Counter()
+        self._thread = None
+        self._is_running = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._is_running
+
+    def start(self):
+        """
+        Starts sampling.
+        """
+        self._stacks = Counter()
+        self._is_running = True
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Tuple[str, int]:
+        """
+        Stops sampling and writes the samples to a file.
+
+        :return: tuple of the form (<path of the file>, <number of samples>)
+        """
+        self._is_running = False
+        self._thread.join()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S.collapsed"))
+        with open(path, "w") as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        sample_count = sum(self._stacks.values())
+        logger.info("Wrote %d samples to %s", sample_count, path)
+        return path, sample_count
+
+    def _sample(self):
+        own_ident = threading.get_ident()
+        while self._is_running:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                functions = []
+                while frame is not None:
+                    code = frame.f_code
+                    functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                functions.append(thread_names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(functions))] += 1
+            time.sleep(self.interval)
+
+
+class LoopLagMonitor:
+    def __init__(self, sections: Iterable[Tuple[object, str]] = (), interval: float = 0.05, threshold: float = 0.05):
+        """
+        Initializes a `LoopLagMonitor` instance.
+
+        While running, measures how late the event loop wakes up from a sleep of `interval` seconds (the lag), times
+        every callback the event loop runs and records those taking at least `threshold` seconds. Also times every
+        call of the given sections. Nothing is patched (or measured) while it is not running.
+
+        :param sections: tuples of the form (<class or module>, <name of the function>) to time
+        :param interval: seconds between two lag measurements
+        :param threshold: seconds a callback must take to be reported as slow
+        """
+        self.sections = list(sections)
+        self.interval = interval
+        self.threshold = threshold
+        self._lags = []
+        self._slow_callbacks = defaultdict(list)  # description -> durations
+        self._section_durations = defaultdict(list)  # name -> durations
+        self._originals = []  # (owner, name, original)
+        self._task = None
+        self._started_at = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """
+        Starts measuring.
+        """
+        self._lags = []
+        self._slow_callbacks = defaultdict(list)
+        self._section_durations = defaultdict(list)
+        self._started_at = time.perf_counter()
+        self._patch(asyncio.events.Handle, "_run", self._time_callback)
+        for owner, name in self.sections:
+            self._patch(owner, name, self._time_section)
+        self._task = asyncio.ensure_future(self._measure_lag())
+
+    def stop(self) -> str:
+        """
+        Stops measuring and restores the patched functions.
+
+        :return: the report
+        """
+        self._task.cancel()
+        self._task = None
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+        return self._get_report()
+
+    def _patch(self, owner, name: str, create_wrapper):
+        original = owner.__dict__[name]
+        self._originals.append((owner, name, original))
+        setattr(owner, name, create_wrapper(original, f"{getattr(owner, '__name__', owner)}.{name}"))
+
+    def _time_callback(self, run, _):
+        monitor = self
+
+        @functools.wraps(run)
+        def timed_run(handle):
+            started_at = time.perf_counter()
+            run(handle)
+            duration = time.perf_counter() - started_at
+            if duration >= monitor.threshold:
+                try:
+                    monitor._slow_callbacks[_describe_handle(handle)].append(duration)
+                except Exception:  # The monitor must never stop the event loop
+                    logger.debug("Could not record a slow callback", exc_info=True)
+
+        return timed_run
+
+    def _time_section(self, function, name: str):
+        durations = self._section_durations[name]
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def timed_coroutine(*args, **kwargs):
+                started_at = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    durations.append(time.perf_counter() - started_at)
+
+            return timed_coroutine
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                durations.append(time.perf_counter() - started_at)
+
+        return timed_function
+
+    async def _measure_lag(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            expected_at = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._lags.append(max(loop.time() - expected_at, 0))
+
+    def _get_report(self) -> str:
+        elapsed = time.perf_counter() - self._started_at
+        lines = [f"Event loop lag over {elapsed:.1f}s ({len(self._lags)} samples):"]
+        lines.append(f"  {_format_durations(self._lags)}" if len(self._lags) > 0 else "  no samples")
+        lines.append(f"Slow callbacks (>= {self.threshold * 1000:.0f}ms):")
+        slow_callbacks = sorted(self._slow_callbacks.items(), key=lambda item: max(item[1]), reverse=True)
+        for description, durations in slow_callbacks[:10]:
+            lines.append(f"  {len(durations)}x max={max(durations) * 1000:.1f}ms {description}")
+        if len(slow_callbacks) == 0:
+            lines.append("  none")
+        lines.append("Sections:")
+        for name, durations in self._section_durations.items():
+            if len(durations) > 0:
+                lines.append(f"  {name}: {len(durations)} calls, {_format_durations(durations)}")
+        return "\n".join(lines)
+
+
+def _describe_handle(handle) -> str:
+    """
+    Returns a description of the callback of the handle. For the step of a task, it is the chain of coroutines the
+    task awaits (or the coroutine of the task if it is done).
+    """
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if not isinstance(task, asyncio.Task):
+        return getattr(callback, "__qualname__", repr(callback))
+    names = []
+    get_coro = getattr(task, "get_coro", None)  # Python 3.8+
+    coroutine = get_coro() if get_coro is not None else getattr(task, "_coro", None)
+    while coroutine is not None and hasattr(coroutine, "cr_await"):
+        names.append(coroutine.__qualname__)
+        coroutine = coroutine.cr_await
+    return " > ".join(names[-4:])
@@ -0,0 +1,104 @@
+import copy
+import json
+import logging
+import os
+from typing import Dict
+
+from src.atomic_file import write_atomically
+from src.logging_config import stream_handler
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(stream_handler)
+
+# Number of appended records after which the journal is compacted into a single snapshot
+_MAX_RECORDS = 1000
+
+_INITIAL_STATE = {
+    "running": False,
+    "voiceChannelId": None,
+    "masterVolume": None,
+    "trackListVolumes": {},  # track list name -> volume
+    "playing": None,  # name of the track list
+    "resumePosition": None,  # [<track list name>, <track index>, <file>, <millisecond>]
+}
+
+
+class SessionJournal:
+    def __init__(self, path: str):
+        """
+        Initializes a `SessionJournal` instance.
+
+        Keeps the state of the running session (see `_INITIAL_STATE`) and journals every change to it by appending
+        a JSON line to the file at `path`, so the session can be restored after a restart or crash. Appending is
+        cheap, the journal is only rewritten (as a single snapshot) when the session starts and every
+        `_MAX_RECORDS` changes.
+
+        :param path: path of the journal file
+        """
+        self.path = path
+        self.state = copy.deepcopy(_INITIAL_STATE)
+        self._fd = None
+        self._record_count = 0
+        try:
+            with open(path, "r") as file:
+                for line in file:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, TypeError, AttributeError):
+                        logger.warning("Skipped an invalid record in the session journal at %s", path)
+                    self._record_count += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Could not read the session journal at %s", path)
+
+    def _apply(self, record: Dict):
+        for key, value in record.items():
+            if key == "trackListVolume":
+                name, volume = value
+                self.state["trackListVolumes"][name] = volume
+            else:
+                self.state[key] = value
+
+    def append(self, record: Dict):
+        """
+        Applies the changes of the record to the state and appends it to the journal.
+
+        The key "trackListVolume" (with a value of the form [<name>, <volume>]) changes the volume of a single
+        track list, every other key replaces the value in the state.
+        """
+        self._apply(record)
+        if self._record_count >= _MAX_RECORDS:
+            self.reset(self.state)
+            return
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.write(self._fd, (json.dumps(record) + "\n").encode())
+            self._record_count += 1
+        except OSError:
+            logger.warning("Could not append to the session journal at %s", self.path)
+
+    def reset(self, state: Dict = None):
+        """
+        Replaces the state with the initial one updated by the given state and rewrites the journal as a single
+        snapshot (see `write_atomically()`).
+        """
+        new_state = copy.deepcopy(_INITIAL_STATE)
+        new_state.update(copy.deepcopy(state if state is not None else {}))
+        self.state = new_state
+        self.close()
+        try:
+            write_atomically(self.path, json.dumps(self.state) + "\n")
+            self._record_count = 1
+        except OSError:
+            logger.warning("Could not write the session journal at %s", self.path)
+
+    def close(self):
+        """
+        Closes the journal file. It is opened again by the next `append()`.
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
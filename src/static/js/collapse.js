@@ -2,9 +2,38 @@ function toggleCollapsedIcon(e) {
     $(e.target).prev(".collapse-btn").find(".collapse-icon").toggleClass("fa-plus fa-minus");
 }
 
+function loadMusicGroup(groupIndex) {
+    const content = $(`.music-group-content[data-group-index="${groupIndex}"]`);
+    if (content.data("loading")) {
+        return content.data("loading");
+    }
+    const loading = fetch("/groups/" + groupIndex)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error("Failed to load group " + groupIndex);
+            }
+            return response.text();
+        })
+        .then(html => {
+            content.html(html);
+            initTrackListVolumeSliders(content);
+            return content;
+        })
+        .catch(error => {
+            content.removeData("loading");
+            console.log(error);
+            displayToast("Music", "Could not load the track lists.");
+        });
+    content.data("loading", loading);
+    return loading;
+}
+
 
 $(document).ready(function() {
     const collapsibles = $(".collapse");
+    collapsibles.on('show.bs.collapse', function(e) {
+        loadMusicGroup($(e.target).find(".music-group-content").data("group-index"));
+    });
     collapsibles.on('hidden.bs.collapse', toggleCollapsedIcon);
     collapsibles.on('shown.bs.collapse', toggleCollapsedIcon);
-});
\ No newline at end of file
+});
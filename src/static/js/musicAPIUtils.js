@@ -1,50 +1,65 @@
-function sendCmdPlayMusic(groupIndex, trackListIndex) {
+let nextRequestId = 1;
+const pendingRequests = {};
+
+function sendCmd(toSend) {
     if (conn === null) {
         onNotConnected();
-        return;
+        return null;
     }
-    const toSend = {
+    const requestId = nextRequestId++;
+    toSend["requestId"] = requestId;
+    pendingRequests[requestId] = performance.now();
+    conn.send(JSON.stringify(toSend));
+    return requestId;
+}
+
+function sendCmdBatch(actions) {
+    return sendCmd({
+        "actions": actions,
+    });
+}
+
+function sendCmdPlayMusic(groupIndex, trackListIndex) {
+    return sendCmd({
         "action": "playMusic",
         "groupIndex": groupIndex,
         "trackListIndex": trackListIndex,
-    };
-    conn.send(JSON.stringify(toSend));
+    });
 }
 
 
 function sendCmdStopMusic() {
-    if (conn === null) {
-        onNotConnected();
-        return;
-    }
-    const toSend = {
+    return sendCmd({
         "action": "stopMusic",
-    };
-    conn.send(JSON.stringify(toSend));
+    });
 }
 
 function sendCmdSetMusicMasterVolume(volume) {
-    if (conn === null) {
-        onNotConnected();
-        return;
-    }
-    const toSend = {
+    return sendCmd({
         "action": "setMusicMasterVolume",
         "volume": volume,
-    };
-    conn.send(JSON.stringify(toSend));
+    });
 }
 
 function sendCmdSetTrackListVolume(groupIndex, trackListIndex, volume) {
-    if (conn === null) {
-        onNotConnected();
-        return;
-    }
-    const toSend = {
+    return sendCmd({
         "action": "setTrackListVolume",
         "groupIndex": groupIndex,
         "trackListIndex": trackListIndex,
         "volume": volume,
-    };
-    conn.send(JSON.stringify(toSend));
+    });
+}
+
+function sendCmdSeek(position) {
+    return sendCmd({
+        "action": "seek",
+        "position": position,
+    });
+}
+
+function sendCmdPlayScene(sceneName) {
+    return sendCmd({
+        "action": "playScene",
+        "sceneName": sceneName,
+    });
 }
@@ -24,11 +24,20 @@ function selectTrackListVolumeSlider(groupIndex, trackListIndex) {
     return $("#track-list-volume-" + groupIndex + "-" + trackListIndex);
 }
 
+function selectTrackPosition() {
+    return $("#music-position");
+}
+
+function selectTrackPositionSlider() {
+    return $("#music-position-slider");
+}
+
 // Utility functions
 
 function setMusicNotPlaying() {
     selectPlayingInMusicTab().removeClass("playing");
     selectMusicOverview().text("-");
+    clearTrackPosition();
 }
 
 function setMusicPlaying(groupIndex, groupName, trackListIndex, trackName) {
@@ -44,4 +53,50 @@ function setMusicMasterVolume(volume) {
 
 function setTrackListVolumeSlider(groupIndex, trackListIndex, volume) {
     selectTrackListVolumeSlider(groupIndex, trackListIndex).slider('setValue', volume);
-}
\ No newline at end of file
+}
+
+// The last position received from the server, the current position is interpolated from it
+let trackPosition = null;
+let isSeeking = false;
+
+function setTrackPosition(position, duration) {
+    trackPosition = {"position": position, "duration": duration, "receivedAt": performance.now()};
+    const slider = selectTrackPositionSlider();
+    if (duration !== null) {
+        slider.slider("setAttribute", "max", duration);
+        slider.slider("enable");
+    } else {
+        slider.slider("disable");
+    }
+    updateTrackPosition();
+}
+
+function clearTrackPosition() {
+    trackPosition = null;
+    selectTrackPosition().text("-");
+    const slider = selectTrackPositionSlider();
+    slider.slider("setValue", 0);
+    slider.slider("disable");
+}
+
+function updateTrackPosition() {
+    if (trackPosition === null) {
+        return;
+    }
+    let position = trackPosition.position + performance.now() - trackPosition.receivedAt;
+    if (trackPosition.duration !== null) {
+        position = Math.min(position, trackPosition.duration);
+        selectTrackPosition().text(`${formatTime(position)} / ${formatTime(trackPosition.duration)}`);
+        if (!isSeeking) {
+            selectTrackPositionSlider().slider("setValue", position);
+        }
+    } else {
+        selectTrackPosition().text(formatTime(position));
+    }
+}
+
+function formatTime(milliseconds) {
+    const totalSeconds = Math.floor(milliseconds / 1000);
+    const seconds = String(totalSeconds % 60).padStart(2, "0");
+    return `${Math.floor(totalSeconds / 60)}:${seconds}`;
+}
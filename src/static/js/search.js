@@ -0,0 +1,47 @@
+let searchTimeout = null;
+
+function searchMusic(query) {
+    const resultContainer = $("#music-search-results");
+    if (query.trim() === "") {
+        resultContainer.empty();
+        return;
+    }
+    fetch("/search?q=" + encodeURIComponent(query))
+        .then(response => response.json())
+        .then(data => {
+            resultContainer.empty();
+            if (data.results.length === 0) {
+                resultContainer.append($("<div class='group-item'></div>").text("No matches."));
+                return;
+            }
+            for (const result of data.results) {
+                const item = $("<div class='group-item'></div>");
+                const link = $("<a class='btn' role='button'></a>").text(`${result.groupName} > ${result.trackListName}`);
+                link.on("click", () => showTrackList(result.groupIndex, result.trackListIndex));
+                const playButton = $("<button type='button' class='btn'><i class='fas fa-play player-icon'></i></button>");
+                playButton.on("click", () => sendCmdPlayMusic(result.groupIndex, result.trackListIndex));
+                item.append(link, playButton);
+                resultContainer.append(item);
+            }
+        })
+        .catch(error => console.log(error));
+}
+
+function showTrackList(groupIndex, trackListIndex) {
+    $("#collapseMusicGroup" + groupIndex).collapse("show");
+    loadMusicGroup(groupIndex).then(() => {
+        const trackList = selectTrackListContainer(groupIndex, trackListIndex);
+        if (trackList.length > 0) {
+            trackList[0].scrollIntoView({behavior: "smooth", block: "center"});
+        }
+    });
+}
+
+
+$(document).ready(function() {
+    $("#music-search").on("input", function(e) {
+        clearTimeout(searchTimeout);
+        const query = $(e.target).val();
+        searchTimeout = setTimeout(() => searchMusic(query), 200);
+    });
+});
@@ -1,11 +1,5 @@
-$(document).ready(function() {
-    const musicMasterVolume = $("#music-master-volume");
-    musicMasterVolume.slider({});
-    musicMasterVolume.on("slideStop", function(slideEvt) {
-        sendCmdSetMusicMasterVolume(slideEvt.value);
-    });
-
-    const trackListVolume = $(".track-list-volume");
+function initTrackListVolumeSliders(container) {
+    const trackListVolume = container.find(".track-list-volume");
     trackListVolume.slider({});
     trackListVolume.on("slideStop", function(slideEvt) {
         const target = $(slideEvt.currentTarget);
@@ -13,4 +7,23 @@ $(document).ready(function() {
         const trackListIndex = target.data("track-list-index");
         sendCmdSetTrackListVolume(groupIndex, trackListIndex, slideEvt.value);
     });
-});
\ No newline at end of file
+}
+
+
+$(document).ready(function() {
+    const musicMasterVolume = $("#music-master-volume");
+    musicMasterVolume.slider({});
+    musicMasterVolume.on("slideStop", function(slideEvt) {
+        sendCmdSetMusicMasterVolume(slideEvt.value);
+    });
+    const trackPositionSlider = $("#music-position-slider");
+    trackPositionSlider.slider({});
+    trackPositionSlider.on("slideStart", function() {
+        isSeeking = true;
+    });
+    trackPositionSlider.on("slideStop", function(slideEvt) {
+        isSeeking = false;
+        sendCmdSeek(slideEvt.value);
+    });
+    setInterval(updateTrackPosition, 500);
+});
@@ -16,31 +16,7 @@ function connect() {
         console.log("Connected");
     };
     conn.onmessage = function(message) {
-        const data = JSON.parse(message.data);
-        switch (data.action) {
-            case "nowPlaying": {
-                _handleNowPlaying(data);
-                break;
-            }
-            case "musicStopped": {
-                _handleMusicStopped(data);
-                break;
-            }
-            case "musicFinished": {
-                _handleMusicFinished(data);
-                break;
-            }
-            case "setMusicMasterVolume": {
-                _handleSetMusicMasterVolume(data);
-                break;
-            }
-            case "setTrackListVolume": {
-                _handleSetTrackListVolume(data);
-                break;
-            }
-            default:
-                console.log("Received unknown action: " + data.action);
-        }
+        _handleMessage(JSON.parse(message.data));
     };
     conn.onclose = function() {
         console.log("Disconnected");
@@ -48,6 +24,49 @@ function connect() {
     };
 }
 
+function _handleMessage(data) {
+    switch (data.action) {
+        case "batch": {
+            data.messages.forEach(_handleMessage);
+            break;
+        }
+        case "ack": {
+            _handleAck(data);
+            break;
+        }
+        case "error": {
+            _handleError(data);
+            break;
+        }
+        case "nowPlaying": {
+            _handleNowPlaying(data);
+            break;
+        }
+        case "musicStopped": {
+            _handleMusicStopped(data);
+            break;
+        }
+        case "musicFinished": {
+            _handleMusicFinished(data);
+            break;
+        }
+        case "setMusicMasterVolume": {
+            _handleSetMusicMasterVolume(data);
+            break;
+        }
+        case "setTrackListVolume": {
+            _handleSetTrackListVolume(data);
+            break;
+        }
+        case "trackPosition": {
+            _handleTrackPosition(data);
+            break;
+        }
+        default:
+            console.log("Received unknown action: " + data.action);
+    }
+}
+
 function disconnect() {
    if (conn != null) {
        conn.close();
@@ -86,6 +105,21 @@ function displayToast(title, message) {
     toastSelector.toast("show");
 }
 
+function _handleAck(data) {
+    const sentAt = pendingRequests[data.requestId];
+    delete pendingRequests[data.requestId];
+    if (sentAt !== undefined) {
+        const roundTrip = performance.now() - sentAt;
+        console.log(`Request ${data.requestId} took ${roundTrip.toFixed(1)} ms (server: ${data.timings.total.toFixed(1)} ms)`);
+    }
+}
+
+function _handleError(data) {
+    delete pendingRequests[data.requestId];
+    console.log("Request " + data.requestId + " failed: " + data.message);
+    displayToast("Error", $("<div>").text(data.message).html());
+}
+
 function _handleNowPlaying(data) {
     setMusicPlaying(data.groupIndex, data.groupName, data.trackListIndex, data.trackName);
     console.log("Now playing " + data.trackName + " (group " + data.groupIndex + " at index "
@@ -114,3 +148,11 @@ function _handleSetTrackListVolume(data) {
     console.log("music volume for group=" + data.groupIndex + ", trackList=" + data.trackListIndex +
         " set to " + data.volume);
 }
+
+function _handleTrackPosition(data) {
+    if (data.position === null) {
+        clearTrackPosition();
+        return;
+    }
+    setTrackPosition(data.position, data.duration);
+}
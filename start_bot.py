@@ -1,7 +1,5 @@
 import argparse
 
-from src.music_bot import MusicBot
-
 if __name__ == "__main__":
     """
     Starts the bot with the provided YAML config file.
@@ -9,16 +7,49 @@ if __name__ == "__main__":
     Accepts the following optional arguments:
     --host "your.new.host.ip" (default="127.0.0.1")
     --port port_number (default=8080)
+    --cache-dir "path/to/cache" (default=".dndj_cache" or the DNDJ_CACHE_DIR environment variable)
+    --log-format text|json (default=text)
+    --log-level debug|info|warning|error|critical (default=INFO)
 
     Run this script as follows:
     `python start_bot.py "path/to/config.yaml"`
     """
+    # Imported here since the worker process of the audio engine imports this module as well
+    from src import cache, logging_config
+    from src.music_bot import MusicBot
+
     parser = argparse.ArgumentParser(description="Start the server")
     parser.add_argument("config", metavar="C", help="path to the config file")
     parser.add_argument(
         "--host", dest="host", action="store", default="127.0.0.1", help="The host (default: 127.0.0.1)"
     )
     parser.add_argument("--port", dest="port", action="store", default=8080, help="The port (default: 8080)")
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        action="store",
+        default=cache.DEFAULT_CACHE_DIR,
+        help="The cache directory, can be shared by multiple bots (default: .dndj_cache)",
+    )
+    parser.add_argument(
+        "--log-format",
+        dest="log_format",
+        action="store",
+        choices=["text", "json"],
+        default="text",
+        help="The format of the log, 'json' includes the session and client (default: text)",
+    )
+    parser.add_argument(
+        "--log-level",
+        dest="log_level",
+        action="store",
+        type=str.upper,
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        default=None,
+        help="The log level (default: INFO)",
+    )
 
     args = parser.parse_args()
+    cache.configure(args.cache_dir)
+    logging_config.configure(args.log_format, args.log_level)
     MusicBot(config_path=args.config, host=args.host, port=args.port).run()